@@ -4,13 +4,12 @@ pre-implemented and can be used by subclasses, or called by the controller. Code
 """
 import ctypes
 import platform
-import re
 import threading
 import time
 import warnings
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import List, Union
+from typing import Dict, List, Union
 
 import customtkinter
 import numpy as np
@@ -166,6 +165,7 @@ class Bot(ABC):
         """
         Attempts to focus and initialize the game window by identifying core UI elements.
         """
+        imsearch.preload()
         self.win.focus()
         time.sleep(0.5)
         self.win.initialize()
@@ -295,7 +295,7 @@ class Bot(ABC):
         """
         minimap = self.win.minimap.screenshot()
         # debug.save_image("minimap.png", minimap)
-        only_friends = clr.isolate_colors(minimap, [clr.GREEN])
+        only_friends = clr.isolate_colors(minimap, [clr.GREEN], region=self.win.minimap)
         # debug.save_image("minimap_friends.png", only_friends)
         mean = only_friends.mean(axis=(0, 1))
         return mean != 0.0
@@ -349,7 +349,7 @@ class Bot(ABC):
         # Take a screenshot of rect
         char_screenshot = char_rect.screenshot()
         # Isolate HP bars in that rectangle
-        hp_bars = clr.isolate_colors(char_screenshot, [clr.RED, clr.GREEN])
+        hp_bars = clr.isolate_colors(char_screenshot, clr.HP_BAR_COLORS)
         # If there are any HP bars, return True
         return hp_bars.mean(axis=(0, 1)) != 0.0
 
@@ -357,48 +357,57 @@ class Bot(ABC):
         """
         Gets the HP value of the player. Returns -1 if the value couldn't be read.
         """
-        if res := ocr.extract_text(self.win.hp_orb_text, ocr.PLAIN_11, [clr.ORB_GREEN, clr.ORB_RED]):
-            return int("".join(re.findall(r"\d", res)))
-        return -1
+        value = ocr.read_int(self.win.hp_orb_text, ocr.PLAIN_11, clr.ORB_COLORS)
+        return -1 if value is None else value
 
     def get_prayer(self) -> int:
         """
         Gets the Prayer points of the player. Returns -1 if the value couldn't be read.
         """
-        if res := ocr.extract_text(self.win.prayer_orb_text, ocr.PLAIN_11, [clr.ORB_GREEN, clr.ORB_RED]):
-            return int("".join(re.findall(r"\d", res)))
-        return -1
+        value = ocr.read_int(self.win.prayer_orb_text, ocr.PLAIN_11, clr.ORB_COLORS)
+        return -1 if value is None else value
 
     def get_run_energy(self) -> int:
         """
         Gets the run energy of the player. Returns -1 if the value couldn't be read.
         """
-        if res := ocr.extract_text(self.win.run_orb_text, ocr.PLAIN_11, [clr.ORB_GREEN, clr.ORB_RED]):
-            return int("".join(re.findall(r"\d", res)))
-        return -1
+        value = ocr.read_int(self.win.run_orb_text, ocr.PLAIN_11, clr.ORB_COLORS)
+        return -1 if value is None else value
 
     def get_special_energy(self) -> int:
         """
         Gets the special attack energy of the player. Returns -1 if the value couldn't be read.
         """
-        if res := ocr.extract_text(self.win.spec_orb_text, ocr.PLAIN_11, [clr.ORB_GREEN, clr.ORB_RED]):
-            return int("".join(re.findall(r"\d", res)))
-        return -1
+        value = ocr.read_int(self.win.spec_orb_text, ocr.PLAIN_11, clr.ORB_COLORS)
+        return -1 if value is None else value
+
+    def get_orb_values(self) -> Dict[str, int]:
+        """
+        Gets the HP, Prayer points, run energy and special attack energy of the player from a single screenshot of
+        the minimap area. Values that couldn't be read are -1.
+        Returns:
+            A dictionary with the keys "hp", "prayer", "run" and "spec".
+        """
+        rects = {
+            "hp": self.win.hp_orb_text,
+            "prayer": self.win.prayer_orb_text,
+            "run": self.win.run_orb_text,
+            "spec": self.win.spec_orb_text,
+        }
+        values = ocr.read_ints(rects, self.win.minimap_area, ocr.PLAIN_11, clr.ORB_COLORS)
+        return {name: -1 if value is None else value for name, value in values.items()}
 
     def get_total_xp(self) -> int:
         """
         Gets the total XP of the player using OCR. Returns -1 if the value couldn't be read.
         """
-        fonts = [ocr.PLAIN_11, ocr.PLAIN_12, ocr.BOLD_12]
-        for font in fonts:
-            if res := ocr.extract_text(self.win.total_xp, font, [clr.WHITE]):
-                return int("".join(re.findall(r"\d", res)))
-        return -1
+        value = ocr.read_int(self.win.total_xp, [ocr.PLAIN_11, ocr.PLAIN_12, ocr.BOLD_12], [clr.WHITE])
+        return -1 if value is None else value
 
     def mouseover_text(
         self,
         contains: Union[str, List[str]] = None,
-        color: Union[clr.Color, List[clr.Color]] = None,
+        color: Union[clr.Color, List[clr.Color], clr.ColorSet] = None,
     ) -> Union[bool, str]:
         """
         Examines the mouseover text area.
@@ -412,13 +421,7 @@ class Bot(ABC):
             If args are left blank, returns the text in the mouseover area.
         """
         if color is None:
-            color = [
-                clr.OFF_CYAN,
-                clr.OFF_GREEN,
-                clr.OFF_ORANGE,
-                clr.OFF_WHITE,
-                clr.OFF_YELLOW,
-            ]
+            color = clr.MOUSEOVER_COLORS
         if contains is None:
             return ocr.extract_text(self.win.mouseover, ocr.BOLD_12, color)
         return bool(ocr.find_text(contains, self.win.mouseover, ocr.BOLD_12, color))
@@ -520,6 +523,7 @@ class Bot(ABC):
             if auto_retal_btn := imsearch.search_img_in_rect(
                 imsearch.BOT_IMAGES.joinpath("combat", "autoretal_off.png"),
                 self.win.control_panel,
+                remember=True,
             ):
                 self.mouse.move_to(auto_retal_btn.random_point(), mouseSpeed="medium")
                 self.mouse.click()
@@ -528,6 +532,7 @@ class Bot(ABC):
         elif auto_retal_btn := imsearch.search_img_in_rect(
             imsearch.BOT_IMAGES.joinpath("combat", "autoretal_on.png"),
             self.win.control_panel,
+            remember=True,
         ):
             self.mouse.move_to(auto_retal_btn.random_point(), mouseSpeed="medium")
             self.mouse.click()
@@ -564,9 +569,11 @@ class Bot(ABC):
             ],
         }
 
+        # Read the control panel once for all of the style's names
+        found = ocr.find_phrases(styles[combat_style], self.win.control_panel, ocr.PLAIN_11, clr.OFF_ORANGE)
         for style in styles[combat_style]:
             # Try and find the center of the word with OCR
-            if result := ocr.find_text(style, self.win.control_panel, ocr.PLAIN_11, clr.OFF_ORANGE):
+            if result := found[style]:
                 # If the word is found, draw a rectangle around it and click a random point in that rectangle
                 center = result[0].get_center()
                 rect = Rectangle.from_points(Point(center[0] - 32, center[1] - 34), Point(center[0] + 32, center[1] + 10))
@@ -586,12 +593,12 @@ class Bot(ABC):
         self.log_msg(f"Toggling run {state}...")
 
         if toggle_on:
-            if run_status := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("run_off.png"), self.win.run_orb, 0.323):
+            if run_status := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("run_off.png"), self.win.run_orb, 0.323, remember=True):
                 self.mouse.move_to(run_status.random_point())
                 self.mouse.click()
             else:
                 self.log_msg("Run is already on.")
-        elif run_status := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("run_on.png"), self.win.run_orb, 0.323):
+        elif run_status := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("run_on.png"), self.win.run_orb, 0.323, remember=True):
             self.mouse.move_to(run_status.random_point())
             self.mouse.click()
         else:
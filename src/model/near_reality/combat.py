@@ -65,7 +65,8 @@ class NRCombat(NRBot):
                 npc: RuneLiteObject = self.get_nearest_tagged_NPC()
                 if npc is not None:
                     self.log_msg("Attacking NPC...")
-                    self.mouse.move_to(npc.random_point())
+                    lead = self.mouse.estimate_duration(npc.center())
+                    self.mouse.move_to(self.npc_tracker.random_point(npc, lead=lead))
                     self.mouse.click()
                     time.sleep(3)
                     timeout -= 3
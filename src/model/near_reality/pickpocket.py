@@ -160,7 +160,7 @@ class NRPickpocket(NRBot):
             stack_size = api.get_inv_item_stack_amount(item_ids.coin_pouches)
             if self.should_click_coin_pouch and stack_size > 22:
                 self.log_msg("Clicking coin pouch...")
-                pouch = imsearch.search_img_in_rect(image=coin_pouch_path, rect=self.win.control_panel)
+                pouch = imsearch.search_img_in_rect(image=coin_pouch_path, rect=self.win.control_panel, remember=True)
                 if pouch:
                     self.mouse.move_to(
                         pouch.random_point(),
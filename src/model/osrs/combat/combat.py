@@ -123,7 +123,8 @@ class OSRSCombat(OSRSBot, launcher.Launchable):
                 failed_searches = 0
 
                 # Click target if mouse is actually hovering over it, else recalculate
-                self.mouse.move_to(target.random_point())
+                lead = self.mouse.estimate_duration(target.center())
+                self.mouse.move_to(self.npc_tracker.random_point(target, lead=lead))
                 if not self.mouseover_text(contains="Attack", color=clr.OFF_WHITE):
                     continue
                 self.mouse.click()
@@ -24,6 +24,7 @@ import utilities.ocr as ocr
 import utilities.runelite_cv as rcv
 from model.bot import Bot, BotStatus
 from utilities.geometry import Point, Rectangle, RuneLiteObject
+from utilities.tracker import ObjectTracker
 from utilities.window import Window
 
 
@@ -91,6 +92,7 @@ class RuneLiteBot(Bot, metaclass=ABCMeta):
 
     def __init__(self, game_title, bot_title, description, window: Window = RuneLiteWindow("RuneLite")) -> None:
         super().__init__(game_title, bot_title, description, window)
+        self.npc_tracker = ObjectTracker()
 
     # --- OCR Functions ---
     @deprecated(reason="This is a slow way of checking if you are in combat. Consider using an API function instead.")
@@ -185,19 +187,24 @@ class RuneLiteBot(Bot, metaclass=ABCMeta):
             include_in_combat: Whether to include NPCs that are already in combat.
         Returns:
             A RuneLiteObject object or None if no tagged NPCs are found.
+        Note:
+            Every detected NPC is passed to `self.npc_tracker`, so the result can be aimed at with
+            `self.npc_tracker.random_point(npc, lead=self.mouse.estimate_duration(npc.center()))` if it is moving.
         """
         game_view = self.win.game_view
-        img_game_view = game_view.screenshot()
-        # Isolate colors in image
-        img_npcs = clr.isolate_colors(img_game_view, clr.CYAN)
-        img_fighting_entities = clr.isolate_colors(img_game_view, [clr.GREEN, clr.RED])
+        img_game_view = game_view.screenshot(apply_mask=False)
+        # Isolate colors in image, labeling the tag and HP bar colors in one pass
+        labels = clr.TAG_COLORS.segment(img_game_view, mask=game_view.mask)
+        img_npcs = clr.TAG_COLORS.select(labels, clr.CYAN)
+        img_fighting_entities = clr.TAG_COLORS.select(labels, [clr.GREEN, clr.RED])
         # Locate potential NPCs in image by determining contours
         objs = rcv.extract_objects(img_npcs)
+        for obj in objs:
+            obj.set_rectangle_reference(self.win.game_view)
+        self.npc_tracker.update(objs)
         if not objs:
             print("No tagged NPCs found.")
             return None
-        for obj in objs:
-            obj.set_rectangle_reference(self.win.game_view)
         # Sort shapes by distance from player
         objs = sorted(objs, key=RuneLiteObject.distance_from_rect_center)
         if include_in_combat:
@@ -216,8 +223,8 @@ class RuneLiteBot(Bot, metaclass=ABCMeta):
         Returns:
             A list of RuneLiteObjects or empty list if none found.
         """
-        img_rect = rect.screenshot()
-        isolated_colors = clr.isolate_colors(img_rect, color)
+        img_rect = rect.screenshot(apply_mask=False)
+        isolated_colors = clr.isolate_colors(img_rect, color, mask=rect.mask)
         objs = rcv.extract_objects(isolated_colors)
         for obj in objs:
             obj.set_rectangle_reference(rect)
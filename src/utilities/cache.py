@@ -0,0 +1,118 @@
+"""
+A thread-safe least-recently-used cache bounded by both the number of entries and their total size in bytes, with
+hit/miss counters for tuning.
+
+Example:
+    >>> cache = LRUCache(max_entries=512, max_bytes=4 * 1024 * 1024)
+    >>> result = cache.cached(key, lambda: expensive_work(), size=lambda result: result.nbytes)
+    >>> print(cache.stats())
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+MISS = object()
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, enabled: bool = True):
+        """
+        Args:
+            max_entries: The maximum number of entries to keep.
+            max_bytes: The maximum total size of the entries to keep, as reported by `put`.
+            enabled: If False, `cached` always computes, and nothing is stored.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = MISS) -> Any:
+        """
+        Gets the value stored for a key, marking it as recently used.
+        Returns:
+            The value, or `default` if the key isn't stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int = None) -> None:
+        """
+        Stores a value, evicting the least recently used entries until the cache is within its limits. Values larger
+        than `max_bytes` are not stored.
+        Args:
+            key: The key to store the value under.
+            value: The value to store.
+            size: The size of the value in bytes. Defaults to `sys.getsizeof(value)`.
+        """
+        if size is None:
+            size = sys.getsizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def cached(self, key: Hashable, compute: Callable[[], Any], size: Callable[[Any], int] = None) -> Any:
+        """
+        Returns the stored value for a key, otherwise computes, stores and returns a new one.
+        Args:
+            key: The key identifying the value.
+            compute: A function that returns the value.
+            size: A function that returns the size of a value in bytes. Defaults to `sys.getsizeof`.
+        """
+        if not self.enabled:
+            return compute()
+        value = self.get(key)
+        if value is MISS:
+            value = compute()
+            self.put(key, value, size(value) if size is not None else None)
+        return value
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the cache's counters and usage (E.g., for logging while tuning its limits).
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,466 @@
+"""
+Screen capture utilities. All screenshots taken by a Rectangle are routed through this module.
+
+The frame cache allows a bot to grab the entire client once per tick and have every subsequent
+`Rectangle.screenshot()` call return a view into that single frame, rather than performing a separate
+grab for each region (E.g., HP orb, mouseover text, game view). This is both faster and guarantees that
+all regions are read from the same, consistent moment in time.
+
+The capture service grabs the client on a background thread at a fixed rate and keeps the most recent
+frames in a ring buffer, so bot logic can read the newest frame immediately instead of blocking on a grab.
+
+Where frames come from is decided by the active capture backend. By default, the screen is captured live
+with mss. A ReplayCapture backend serves previously recorded frames instead, which allows the OCR/CV
+utilities to be run and profiled without a game client (E.g., on a CI machine).
+
+Example:
+    >>> with self.win.frame():
+    >>>     hp = self.get_hp()
+    >>>     npc = self.get_nearest_tagged_NPC()
+
+    >>> capture.set_backend(capture.ReplayCapture("recordings/session_1.npz", origin=(0, 0)))
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+import cv2
+import mss
+import numpy as np
+
+Frame = NamedTuple("Frame", timestamp=float, image=np.ndarray)
+
+
+class CaptureBackend(ABC):
+    """
+    Base class for sources of screen pixels.
+    """
+
+    @abstractmethod
+    def grab(self, monitor: dict) -> np.ndarray:
+        """
+        Captures an area of the screen.
+        Args:
+            monitor: A dict representing the area to capture {left, top, width, height}.
+        Returns:
+            A BGR Numpy array representing the captured image.
+        """
+        pass
+
+    def close(self) -> None:  # noqa: B027 - An optional hook, backends that hold no resources needn't override it
+        """
+        Releases any resources held by the backend. Does nothing by default.
+        """
+
+
+class MSSCapture(CaptureBackend):
+    """
+    Captures the screen with mss. An mss handle is bound to the thread that created it and is not safe to share,
+    so this class lazily creates one handle per thread. Handles belonging to threads that have exited are closed
+    the next time a new handle is created.
+    """
+
+    def __init__(self):
+        self._handles = {}  # {thread ident: mss handle}
+        self._lock = threading.Lock()
+
+    def __handle(self):
+        ident = threading.get_ident()
+        if sct := self._handles.get(ident):
+            return sct
+        with self._lock:
+            alive = {thread.ident for thread in threading.enumerate()}
+            for dead in [i for i in self._handles if i not in alive]:
+                self._handles.pop(dead).close()
+            sct = self._handles[ident] = mss.mss()
+        return sct
+
+    def grab(self, monitor: dict) -> np.ndarray:
+        """
+        Captures an area of the screen using the calling thread's mss handle.
+        Args:
+            monitor: A dict representing the area to capture {left, top, width, height}.
+        Returns:
+            A BGR Numpy array representing the captured image.
+        """
+        return np.array(self.__handle().grab(monitor))[:, :, :3]
+
+    def close(self) -> None:
+        """
+        Closes all mss handles. New handles will be created on the next grab.
+        """
+        with self._lock:
+            for sct in self._handles.values():
+                sct.close()
+            self._handles.clear()
+
+
+class ReplayCapture(CaptureBackend):
+    def __init__(self, source: Union[str, Path], origin: Tuple[int, int] = None, fps: float = 20, advance_on_grab: bool = False):
+        """
+        Serves previously recorded frames instead of capturing the screen. Each frame is treated as an image of the
+        screen whose top-left corner lies at `origin`, so Rectangles in screen coordinates crop the matching pixels.
+        Args:
+            source: A SessionRecorder recording, a directory of images (played in filename order) or a `.npz`
+                    archive. An archive may contain a `frames` array of shape (N, H, W, 3), or one array per frame
+                    (played in key order), and optionally a `timestamps` array.
+            origin: The screen coordinates (left, top) of the recorded frames' top-left pixel. Typically the
+                    position of the client window when it was recorded. Recordings supply this themselves.
+            fps: The frame rate used to generate timestamps when the source does not provide them.
+            advance_on_grab: If True, every grab moves on to the next frame. Otherwise, call `advance()`.
+        """
+        self.advance_on_grab = advance_on_grab
+        self._lock = threading.Lock()
+        source = Path(source)
+        timestamps = None
+        if source.joinpath("index.bin").exists():
+            from utilities.recorder import SessionReader
+
+            self._frames = SessionReader(source)
+            timestamps = self._frames.timestamps
+            count = len(self._frames)
+            if origin is None:
+                monitor = self._frames.meta["monitor"]
+                origin = (monitor["left"], monitor["top"])
+        elif source.is_dir():
+            self._paths: List[Path] = sorted(p for p in source.iterdir() if p.suffix.lower() in {".png", ".bmp", ".jpg"})
+            self._frames = None
+            count = len(self._paths)
+        else:
+            with np.load(str(source)) as archive:
+                self._frames = archive.get("frames")
+                if self._frames is None:
+                    self._frames = [archive[key] for key in sorted(k for k in archive.files if k != "timestamps")]
+                timestamps = archive.get("timestamps")
+            count = len(self._frames)
+        if count == 0:
+            raise ValueError(f"No frames found in {source}.")
+        self.origin = origin or (0, 0)
+        self.timestamps = np.asarray(timestamps, dtype=float) if timestamps is not None else np.arange(count) / fps
+        self._count = count
+        self._index = 0
+        self._current: np.ndarray = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def index(self) -> int:
+        """The index of the frame currently being served."""
+        return self._index
+
+    @property
+    def timestamp(self) -> float:
+        """The recorded timestamp of the frame currently being served."""
+        return float(self.timestamps[self._index])
+
+    def seek(self, index: int) -> None:
+        """
+        Jumps to a specific frame.
+        Args:
+            index: The index of the frame to serve next.
+        """
+        if not 0 <= index < self._count:
+            raise IndexError(f"Frame index {index} out of range (0-{self._count - 1}).")
+        with self._lock:
+            self._index = index
+            self._current = None
+
+    def advance(self) -> bool:
+        """
+        Moves on to the next frame.
+        Returns:
+            False if the last frame is already being served, True otherwise.
+        """
+        if self._index + 1 >= self._count:
+            return False
+        self.seek(self._index + 1)
+        return True
+
+    def current(self) -> np.ndarray:
+        """
+        Returns the entire frame currently being served.
+        """
+        with self._lock:
+            if self._current is None:
+                if self._frames is None:
+                    self._current = cv2.imread(str(self._paths[self._index]), cv2.IMREAD_COLOR)
+                else:
+                    self._current = np.asarray(self._frames[self._index])[:, :, :3]
+            return self._current
+
+    def grab(self, monitor: dict) -> np.ndarray:
+        frame = self.current()
+        x, y = monitor["left"] - self.origin[0], monitor["top"] - self.origin[1]
+        h, w = frame.shape[:2]
+        if x < 0 or y < 0 or x + monitor["width"] > w or y + monitor["height"] > h:
+            raise ValueError(f"Requested area {monitor} lies outside of the recorded frame.")
+        res = frame[y : y + monitor["height"], x : x + monitor["width"]].copy()
+        if self.advance_on_grab:
+            self.advance()
+        return res
+
+
+_default_backend = MSSCapture()
+_backend: CaptureBackend = _default_backend
+
+
+def set_backend(backend: Optional[CaptureBackend]) -> None:
+    """
+    Sets the source of all subsequent captures.
+    Args:
+        backend: The backend to use, or None to restore the default live mss capture.
+    """
+    global _backend
+    _backend = backend or _default_backend
+
+
+def get_backend() -> CaptureBackend:
+    """
+    Returns the backend currently used for captures.
+    """
+    return _backend
+
+
+def grab(monitor: dict) -> np.ndarray:
+    """
+    Captures an area of the screen using the active backend. Safe to call from multiple threads at once.
+    Args:
+        monitor: A dict representing the area to capture {left, top, width, height}.
+    Returns:
+        A BGR Numpy array representing the captured image.
+    """
+    return _backend.grab(monitor)
+
+
+class FrameCache:
+    """
+    Holds a single capture of a large area (typically the client window) per thread. While a frame is cached,
+    screenshots of regions that fall entirely within it are served as zero-copy views into the frame.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def capture(self, monitor: dict) -> np.ndarray:
+        """
+        Captures an area of the screen and caches it for the calling thread until invalidated.
+        Args:
+            monitor: A dict representing the area to capture {left, top, width, height}.
+        Returns:
+            The captured BGR frame.
+        """
+        frame = np.ascontiguousarray(grab(monitor))
+        self.load(frame, monitor)
+        return frame
+
+    def load(self, frame: np.ndarray, monitor: dict) -> None:
+        """
+        Caches an already-captured frame for the calling thread.
+        Args:
+            frame: A BGR image of the area described by `monitor`.
+            monitor: A dict representing the screen area that the frame covers {left, top, width, height}.
+        """
+        frame.flags.writeable = False
+        self._local.frame = frame
+        self._local.left = monitor["left"]
+        self._local.top = monitor["top"]
+
+    def invalidate(self) -> None:
+        """
+        Discards the calling thread's cached frame. Subsequent screenshots will grab from the screen again.
+        """
+        self._local.frame = None
+
+    def is_active(self) -> bool:
+        """
+        Returns True if the calling thread currently has a cached frame.
+        """
+        return getattr(self._local, "frame", None) is not None
+
+    def crop(self, monitor: dict) -> Optional[np.ndarray]:
+        """
+        Gets a view of an area within the cached frame.
+        Args:
+            monitor: A dict representing the area to crop {left, top, width, height} in screen coordinates.
+        Returns:
+            A BGR view into the cached frame, or None if there is no cached frame or the area is not entirely
+            contained within it.
+        """
+        frame = getattr(self._local, "frame", None)
+        if frame is None:
+            return None
+        x = monitor["left"] - self._local.left
+        y = monitor["top"] - self._local.top
+        h, w = frame.shape[:2]
+        if x < 0 or y < 0 or x + monitor["width"] > w or y + monitor["height"] > h:
+            return None
+        return frame[y : y + monitor["height"], x : x + monitor["width"]]
+
+    @contextmanager
+    def frame(self, monitor: dict):
+        """
+        Context manager that captures a frame on entry and, on exit, restores whichever frame was cached before it
+        (or none). Contexts can therefore be nested: an inner context doesn't end the outer one's frame.
+        Args:
+            monitor: A dict representing the area to capture {left, top, width, height}.
+        Yields:
+            The captured BGR frame.
+        """
+        local = self._local
+        previous = (getattr(local, "frame", None), getattr(local, "left", None), getattr(local, "top", None))
+        try:
+            yield self.capture(monitor)
+        finally:
+            local.frame, local.left, local.top = previous
+
+
+frame_cache = FrameCache()
+
+
+class CaptureService:
+    def __init__(self, monitor: dict, fps: float = 20, buffer_size: int = 8):
+        """
+        Captures an area of the screen on a background thread at a fixed rate, keeping the most recent frames
+        in a preallocated ring buffer. Timestamps are taken from `time.monotonic()`.
+        Args:
+            monitor: A dict representing the area to capture {left, top, width, height} (E.g., the client window).
+            fps: The target number of captures per second.
+            buffer_size: The number of frames to keep in the ring buffer.
+        """
+        if fps <= 0:
+            raise ValueError("FPS must be greater than 0.")
+        if buffer_size < 2:
+            raise ValueError("Buffer size must be at least 2.")
+        self.monitor = dict(monitor)
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self._frames = np.zeros((buffer_size, monitor["height"], monitor["width"], 3), dtype=np.uint8)
+        self._timestamps = np.full(buffer_size, -np.inf)
+        self._head = -1  # Index of the newest frame
+        self._cond = threading.Condition()
+        self._thread: threading.Thread = None
+        self._running = False
+
+    def start(self) -> None:
+        """
+        Starts the capture thread. Does nothing if it is already running.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the capture thread and waits for it to finish.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __run(self):
+        interval = 1 / self.fps
+        next_capture = time.monotonic()
+        while self._running:
+            try:
+                image = grab(self.monitor)
+            except Exception as e:
+                print(f"CaptureService: Failed to capture frame: {e}")
+                time.sleep(interval)
+                next_capture = time.monotonic()
+                continue
+            timestamp = time.monotonic()
+            with self._cond:
+                index = (self._head + 1) % self.buffer_size
+                np.copyto(self._frames[index], image)
+                self._timestamps[index] = timestamp
+                self._head = index
+                self._cond.notify_all()
+            next_capture += interval
+            delay = next_capture - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_capture = time.monotonic()  # Fell behind, don't try to catch up
+
+    def __frame(self, index: int, copy: bool) -> Frame:
+        image = self._frames[index]
+        return Frame(float(self._timestamps[index]), image.copy() if copy else image)
+
+    def latest(self, copy: bool = True) -> Optional[Frame]:
+        """
+        Gets the newest frame without waiting.
+        Args:
+            copy: If False, the returned image is a view into the ring buffer. It is only valid until the buffer
+                  wraps around (`buffer_size` captures later), so use it immediately.
+        Returns:
+            The newest Frame, or None if nothing has been captured yet.
+        """
+        with self._cond:
+            if self._head < 0:
+                return None
+            return self.__frame(self._head, copy)
+
+    def wait_for_newer(self, timestamp: float, timeout: float = None, copy: bool = True) -> Optional[Frame]:
+        """
+        Blocks until a frame newer than the given timestamp is available.
+        Args:
+            timestamp: The timestamp the returned frame must be newer than (E.g., that of the last frame processed).
+            timeout: The maximum number of seconds to wait. Waits indefinitely by default.
+            copy: See `latest()`.
+        Returns:
+            The newest Frame, or None if the timeout elapsed or the service was stopped.
+        """
+        with self._cond:
+            newer = self._cond.wait_for(
+                lambda: not self._running or (self._head >= 0 and self._timestamps[self._head] > timestamp),
+                timeout=timeout,
+            )
+            if not newer or self._head < 0 or self._timestamps[self._head] <= timestamp:
+                return None
+            return self.__frame(self._head, copy)
+
+    def frame_at(self, timestamp: float, copy: bool = True) -> Optional[Frame]:
+        """
+        Gets the frame that was on screen at a given time (i.e., the newest frame captured at or before it).
+        Args:
+            timestamp: A `time.monotonic()` timestamp.
+            copy: See `latest()`.
+        Returns:
+            The matching Frame, or None if the buffer holds no frame that old.
+        """
+        with self._cond:
+            candidates = np.flatnonzero(np.isfinite(self._timestamps) & (self._timestamps <= timestamp))
+            if candidates.size == 0:
+                return None
+            index = candidates[np.argmax(self._timestamps[candidates])]
+            return self.__frame(index, copy)
+
+    def load_latest(self) -> Optional[Frame]:
+        """
+        Loads the newest frame into the frame cache for the calling thread, so that subsequent Rectangle
+        screenshots are served from it. Call `frame_cache.invalidate()` to resume live captures.
+        Returns:
+            The loaded Frame, or None if nothing has been captured yet.
+        """
+        if frame := self.latest():
+            frame_cache.load(frame.image, self.monitor)
+        return frame
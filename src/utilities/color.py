@@ -1,8 +1,11 @@
-from typing import List, Union
+import threading
+from typing import Dict, Iterator, List, Union
 
 import cv2
 import numpy as np
 
+from utilities.dirty_regions import mask_key, region_cache, region_key
+
 
 class Color:
     def __init__(self, lower: List[int], upper: List[int] = None):
@@ -16,25 +19,166 @@ class Color:
         self.upper = np.array(upper[::-1]) if upper else np.array(lower[::-1])
 
 
-def isolate_colors(image: cv2.Mat, colors: Union[Color, List[Color]]) -> cv2.Mat:
+# The number of Colors from which a ColorSet isolates them with lookup tables rather than a pass per Color
+MIN_LUT_COLORS = 3
+
+
+class ColorSet:
+    def __init__(self, colors: Union[Color, List[Color]]):
+        """
+        Compiles a list of Colors into lookup tables that isolate all of them in a single pass over an image. As each
+        Color is a box in BGR space, a pixel is within it if each of its channels is within the box's range on that
+        channel. Each table maps a channel value to a bitmask of the Colors whose range includes it, so a pixel is
+        within any of the Colors if the bitwise AND of its three lookups is non-zero.
+        Args:
+            colors: A Color or list of Colors.
+        """
+        self.colors = colors if isinstance(colors, list) else [colors]
+        self.key = colors_key(self.colors)
+        values = np.arange(256)[:, None]
+        self._luts = []
+        # Each set of tables holds the bitmasks of up to 8 Colors
+        for start in range(0, len(self.colors), 8):
+            lut = np.zeros((256, 3), dtype=np.uint8)
+            for bit, color in enumerate(self.colors[start : start + 8]):
+                lut |= (((values >= color.lower) & (values <= color.upper)) << bit).astype(np.uint8)
+            self._luts.append([np.ascontiguousarray(lut[:, channel]) for channel in range(3)])
+        # Intermediate images, reused between calls on the same thread to avoid allocating them for every frame
+        self._scratch = threading.local()
+
+    def isolate(self, image: cv2.Mat) -> cv2.Mat:
+        """
+        Returns a mask of the pixels of a BGR image within any of the Colors (255), or not (0).
+        """
+        # A pass of cv2.inRange per Color is faster for small sets
+        if len(self.colors) < MIN_LUT_COLORS:
+            mask = cv2.inRange(image, self.colors[0].lower, self.colors[0].upper)
+            for color in self.colors[1:]:
+                mask = cv2.bitwise_or(mask, cv2.inRange(image, color.lower, color.upper))
+            return mask
+        mask = None
+        for bits in self.__lookup(image):
+            found = cv2.compare(bits, 0, cv2.CMP_NE)
+            mask = found if mask is None else cv2.bitwise_or(mask, found)
+        return mask
+
+    def __lookup(self, image: cv2.Mat) -> Iterator[cv2.Mat]:
+        """
+        Yields the bitmask of the Colors each pixel of a BGR image is within, for each set of tables. Each bitmask is
+        only valid until the next one is yielded.
+        """
+        h, w = image.shape[:2]
+        scratch = getattr(self._scratch, "images", None)
+        if scratch is None or scratch[0].shape != (h, w):
+            scratch = self._scratch.images = [np.empty((h, w), dtype=np.uint8) for _ in range(6)]
+        channels, lookups = scratch[:3], scratch[3:]
+        for channel in range(3):
+            cv2.extractChannel(image, channel, dst=channels[channel])
+        for luts in self._luts:
+            for channel, lut, lookup in zip(channels, luts, lookups):
+                cv2.LUT(channel, lut, dst=lookup)
+            cv2.bitwise_and(lookups[0], lookups[1], dst=lookups[0])
+            yield cv2.bitwise_and(lookups[0], lookups[2], dst=lookups[0])
+
+    def segment(self, image: cv2.Mat, mask: cv2.Mat = None) -> cv2.Mat:
+        """
+        Labels every pixel of a BGR image with the Colors it is within, in a single pass. Use `select` to get the mask
+        of any of the Colors from the labels.
+        Args:
+            image: The image to process.
+            mask: Optionally, a single-channel mask the size of the image (E.g., `Rectangle.mask`). Pixels where the
+                  mask is 0 are labeled 0.
+        Returns:
+            A single-channel image where bit i of each pixel is set if it is within `colors[i]` (E.g., 0 for none, 1
+            for the first Color, 2 for the second). Bitmasks are used rather than indices as ranges may overlap.
+        """
+        if len(self.colors) > 8:
+            raise ValueError("Only ColorSets of up to 8 colors can be segmented.")
+        bits = next(self.__lookup(image))
+        return cv2.bitwise_and(bits, mask) if mask is not None else bits.copy()
+
+    def select(self, labels: cv2.Mat, colors: Union[Color, List[Color]]) -> cv2.Mat:
+        """
+        Returns the mask of the pixels within any of the given Colors from the labels returned by `segment`.
+        Args:
+            labels: The labels returned by `segment`.
+            colors: A Color or list of Colors in this set.
+        Returns:
+            The image with the isolated colors (all shown as white), as returned by `isolate_colors`.
+        """
+        keys = [colors_key(color)[0] for color in (colors if isinstance(colors, list) else [colors])]
+        own = [colors_key(color)[0] for color in self.colors]
+        bits = 0
+        for key in keys:
+            if key not in own:
+                raise ValueError("Color is not in this ColorSet.")
+            bits |= 1 << own.index(key)
+        return cv2.compare(cv2.bitwise_and(labels, bits), 0, cv2.CMP_NE)
+
+
+def colors_key(colors: Union[Color, List[Color], ColorSet]) -> tuple:
+    """
+    Returns a hashable key representing the value of a Color, list of Colors or ColorSet.
+    """
+    if isinstance(colors, ColorSet):
+        return colors.key
+    if not isinstance(colors, list):
+        colors = [colors]
+    return tuple((tuple(color.lower.tolist()), tuple(color.upper.tolist())) for color in colors)
+
+
+__color_sets: Dict[tuple, ColorSet] = {}
+
+
+def compile_colors(colors: Union[Color, List[Color], ColorSet]) -> ColorSet:
+    """
+    Returns a ColorSet for a Color or list of Colors, compiling it on first use.
+    """
+    if isinstance(colors, ColorSet):
+        return colors
+    key = colors_key(colors)
+    color_set = __color_sets.get(key)
+    if color_set is None:
+        color_set = __color_sets[key] = ColorSet(colors)
+    return color_set
+
+
+def isolate_colors(image: cv2.Mat, colors: Union[Color, List[Color], ColorSet], region=None, mask: cv2.Mat = None) -> cv2.Mat:
     """
     Isolates ranges of colors within an image and saves a new resulting image.
     Args:
         image: The image to process.
-        colors: A Color or list of Colors.
+        colors: A Color, list of Colors or ColorSet. Lists are compiled into a ColorSet once and then reused.
+        region: Optionally, the Rectangle the image was captured from. If given, and the pixels are identical to the
+                last time colors were isolated for this region, the previous result is returned. The result must
+                then be treated as read-only.
+        mask: Optionally, a single-channel mask the size of the image (E.g., `Rectangle.mask`). Pixels where the
+              mask is 0 are never included in the result.
     Returns:
         The image with the isolated colors (all shown as white).
     """
-    if not isinstance(colors, list):
-        colors = [colors]
-    # Generate masks for each color
-    masks = [cv2.inRange(image, color.lower, color.upper) for color in colors]
-    # Create black mask
-    h, w = image.shape[:2]
-    mask = np.zeros([h, w, 1], dtype=np.uint8)
-    # Combine masks
-    for mask_ in masks:
-        mask = cv2.bitwise_or(mask, mask_)
+    if region is not None:
+        key = ("isolate_colors", region_key(region), colors_key(colors), mask_key(mask))
+        return region_cache.cached(key, image, lambda: __isolate_colors(image, colors, mask, read_only=True))
+    return __isolate_colors(image, colors, mask)
+
+
+def __isolate_colors(image: cv2.Mat, colors: Union[Color, List[Color], ColorSet], keep_mask: cv2.Mat = None, read_only: bool = False) -> cv2.Mat:
+    if image.ndim == 3 and image.shape[2] == 3:
+        mask = compile_colors(colors).isolate(image)
+    else:
+        colors = colors.colors if isinstance(colors, ColorSet) else colors if isinstance(colors, list) else [colors]
+        # Generate masks for each color
+        masks = [cv2.inRange(image, color.lower, color.upper) for color in colors]
+        # Create black mask
+        h, w = image.shape[:2]
+        mask = np.zeros([h, w, 1], dtype=np.uint8)
+        # Combine masks
+        for color_mask in masks:
+            mask = cv2.bitwise_or(mask, color_mask)
+    if keep_mask is not None:
+        mask = cv2.bitwise_and(mask, keep_mask)
+    mask.flags.writeable = not read_only
     return mask
 
 
@@ -60,3 +204,9 @@ OFF_YELLOW = Color([190, 190, 0], [255, 255, 120])
 """Colors for use with minimap orb text"""
 ORB_GREEN = Color([0, 255, 0], [255, 255, 0])
 ORB_RED = Color([255, 0, 0], [255, 255, 0])
+
+"""Compiled sets of colors that are isolated together"""
+MOUSEOVER_COLORS = ColorSet([OFF_CYAN, OFF_GREEN, OFF_ORANGE, OFF_WHITE, OFF_YELLOW])
+ORB_COLORS = ColorSet([ORB_GREEN, ORB_RED])
+HP_BAR_COLORS = ColorSet([GREEN, RED])
+TAG_COLORS = ColorSet([CYAN, PINK, GREEN, RED])
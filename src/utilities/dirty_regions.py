@@ -0,0 +1,109 @@
+"""
+Change detection for screen regions that are polled repeatedly but rarely change (E.g., minimap orbs, the chatbox,
+the mouseover text). For each (region, operation) pair, the last pixels that were processed are remembered along
+with the result. If the next screenshot of that region is pixel-identical, the previous result is returned instead
+of redoing the OCR/CV work.
+
+Example:
+    >>> image = rect.screenshot()
+    >>> text = region_cache.cached(("my_operation", region_key(rect)), image, lambda: expensive_work(image))
+"""
+import hashlib
+import sys
+import threading
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import numpy as np
+
+from utilities.cache import MISS, LRUCache
+
+
+def region_key(rect) -> Tuple[int, int, int, int]:
+    """
+    Returns a hashable key describing a Rectangle's position and size on screen.
+    """
+    return (rect.left, rect.top, rect.width, rect.height)
+
+
+def mask_key(mask: Optional[np.ndarray]) -> Optional[Tuple[tuple, bytes]]:
+    """
+    Returns a hashable key describing the contents of a mask applied to a region, or None if there is no mask. Use
+    it in a key alongside `region_key` when the result of an operation depends on a mask.
+    """
+    if mask is None:
+        return None
+    return (mask.shape, hashlib.blake2b(np.ascontiguousarray(mask), digest_size=16).digest())
+
+
+class DirtyRegionCache:
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Remembers the most recent input pixels and result for each key, evicting the least recently used keys
+        once `max_entries` or `max_bytes` is exceeded.
+        Args:
+            max_entries: The maximum number of (region, operation) pairs to remember.
+            max_bytes: The maximum total size of the remembered pixels and results (which are counted by `nbytes`
+                       if they are arrays).
+        """
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._entries = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Hashable, image: np.ndarray) -> Any:
+        """
+        Gets the stored result for a key if the given pixels are identical to those it was computed from.
+        Args:
+            key: The key identifying the region and operation.
+            image: The pixels that are about to be processed.
+        Returns:
+            The stored result, or `MISS` if the region changed or nothing is stored.
+        """
+        entry = self._entries.get(key)
+        hit = entry is not MISS and entry[0].shape == image.shape and np.array_equal(entry[0], image)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry[1] if hit else MISS
+
+    def store(self, key: Hashable, image: np.ndarray, result: Any) -> None:
+        """
+        Stores the result of processing an image.
+        Args:
+            key: The key identifying the region and operation.
+            image: The pixels that were processed. A copy is kept.
+            result: The result to return for identical pixels in future.
+        """
+        size = image.nbytes + (result.nbytes if isinstance(result, np.ndarray) else sys.getsizeof(result))
+        self._entries.put(key, (image.copy(), result), size=size)
+
+    def cached(self, key: Hashable, image: np.ndarray, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the stored result if the region is unchanged, otherwise computes, stores and returns a new one.
+        Args:
+            key: The key identifying the region and operation.
+            image: The pixels that are about to be processed.
+            compute: A function that processes `image` and returns the result.
+        """
+        if not self.enabled:
+            return compute()
+        result = self.lookup(key, image)
+        if result is MISS:
+            result = compute()
+            self.store(key, image, result)
+        return result
+
+    def clear(self) -> None:
+        """
+        Forgets all stored regions and resets the hit/miss counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+region_cache = DirtyRegionCache()
@@ -0,0 +1,125 @@
+"""
+Packs the OCR font glyphs into a single memory-mapped atlas so that fonts load quickly and lazily.
+
+The loose BMP files in `utilities/fonts/<font>/` remain the source of truth. They are packed into:
+    atlas.bin  - The grayscale pixels of every glyph, back to back.
+    atlas.json - For each font, a fingerprint of its BMP files and a table of (codepoint, offset, height, width).
+
+The atlas is (re)built automatically whenever it is missing or a font's BMPs have changed, and can be rebuilt by
+running this file directly. Glyphs are read-only views into the memory-mapped atlas.
+
+Example:
+    >>> alphabet = load_font("Plain12")
+    >>> alphabet["A"].shape
+"""
+import hashlib
+import json
+import os
+import pathlib
+import threading
+from typing import Dict
+
+import cv2
+import numpy as np
+
+FONTS_PATH = pathlib.Path(__file__).parent.joinpath("fonts")
+ATLAS_PATH = FONTS_PATH.joinpath("atlas.bin")
+INDEX_PATH = FONTS_PATH.joinpath("atlas.json")
+
+_lock = threading.Lock()
+_index: dict = None
+_atlas: np.memmap = None
+
+
+def fingerprint(font: str) -> str:
+    """
+    Returns a hash of the names, sizes and modification times of a font's BMP files.
+    """
+    digest = hashlib.md5()
+    for path in sorted(FONTS_PATH.joinpath(font).rglob("*.bmp")):
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def __read_bmps(font: str) -> Dict[str, cv2.Mat]:
+    """
+    Loads a font's alphabet directly from its BMP files.
+    """
+    alphabet = {}
+    for path in FONTS_PATH.joinpath(font).rglob("*.bmp"):
+        alphabet[chr(int(path.stem))] = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    return alphabet
+
+
+def build() -> dict:
+    """
+    Packs every font in the fonts directory into the atlas, replacing any existing atlas.
+    Returns:
+        The atlas index.
+    """
+    index = {"fonts": {}}
+    blobs = []
+    offset = 0
+    for font_dir in sorted(path for path in FONTS_PATH.iterdir() if path.is_dir()):
+        font = font_dir.name
+        glyphs = []
+        for char, glyph in __read_bmps(font).items():
+            h, w = glyph.shape[:2]
+            glyphs.append((ord(char), offset, h, w))
+            blobs.append(np.ascontiguousarray(glyph).tobytes())
+            offset += h * w
+        index["fonts"][font] = {"fingerprint": fingerprint(font), "glyphs": glyphs}
+    # Write to temporary files first so a partially written atlas is never read
+    tmp_atlas, tmp_index = ATLAS_PATH.with_suffix(".bin.tmp"), INDEX_PATH.with_suffix(".json.tmp")
+    tmp_atlas.write_bytes(b"".join(blobs))
+    tmp_index.write_text(json.dumps(index))
+    os.replace(tmp_atlas, ATLAS_PATH)
+    os.replace(tmp_index, INDEX_PATH)
+    return index
+
+
+def __open(rebuild: bool = False):
+    """
+    Reads the atlas index and maps the atlas into memory, building it first if needed.
+    """
+    global _index, _atlas
+    if rebuild or not ATLAS_PATH.exists() or not INDEX_PATH.exists():
+        _atlas = None  # Release the old mapping so the file can be replaced
+        _index = build()
+    else:
+        _index = json.loads(INDEX_PATH.read_text())
+    _atlas = np.memmap(str(ATLAS_PATH), dtype=np.uint8, mode="r") if ATLAS_PATH.stat().st_size else np.zeros(0, dtype=np.uint8)
+
+
+def load_font(font: str) -> Dict[str, cv2.Mat]:
+    """
+    Loads a font's alphabet from the atlas, rebuilding the atlas if the font's BMP files have changed. If the atlas
+    cannot be written (E.g., a read-only install), the BMP files are read directly instead.
+    Args:
+        font: The name of the font's directory in `utilities/fonts` (E.g., "Plain12").
+    Returns:
+        A dictionary of {"char": image} pairs. The images are read-only.
+    """
+    with _lock:
+        try:
+            if _index is None:
+                __open()
+            entry = _index["fonts"].get(font)
+            if entry is None or entry["fingerprint"] != fingerprint(font):
+                __open(rebuild=True)
+                entry = _index["fonts"][font]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Font atlas unavailable ({e}). Loading {font} from BMP files.")
+            return __read_bmps(font)
+        return {chr(code): _atlas[offset : offset + h * w].reshape(h, w) for code, offset, h, w in entry["glyphs"]}
+
+
+if __name__ == "__main__":
+    """
+    Run this file directly to rebuild the font atlas.
+    """
+    index = build()
+    for font, entry in index["fonts"].items():
+        print(f"{font}: {len(entry['glyphs'])} glyphs")
+    print(f"Wrote {ATLAS_PATH} ({ATLAS_PATH.stat().st_size} bytes)")
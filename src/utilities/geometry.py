@@ -1,28 +1,30 @@
 import math
-from typing import List, NamedTuple
+from typing import List, NamedTuple, Optional, Tuple
 
 import cv2
-import mss
 import numpy as np
 
 import utilities.random_util as rd
+from utilities.capture import frame_cache, grab
 
 Point = NamedTuple("Point", x=int, y=int)
 
-# TODO: Remove this global variable. This is a temporary fix for a bug in mss.
-sct = mss.mss()
-
 
 class Rectangle:
 
     """
     In very rare cases, we may want to exclude areas within a Rectangle (E.g., resizable game view).
-    This should contain a list of dicts that represent rectangles {left, top, width, height} that
-    will be subtracted from this Rectangle during screenshotting.
+    `subtract_list` should contain a list of dicts that represent rectangles {left, top, width, height} that
+    will be subtracted from this Rectangle during screenshotting. The list is compiled into slices when it is
+    assigned, so reassign it rather than modifying it in place. Arbitrary shapes can be masked out with
+    `exclude_polygon()`, or everything outside of a shape with `keep_polygon()` (E.g., the round minimap).
     """
 
-    subtract_list: List[dict] = []
     reference_rect = None
+    _subtract_list: List[dict] = []
+    _subtract_slices: List[Tuple[slice, slice]] = []
+    _polygons: List[Tuple[np.ndarray, bool]] = []
+    _mask: np.ndarray = None
 
     def __init__(self, left: int, top: int, width: int, height: int):
         """
@@ -68,22 +70,83 @@ class Rectangle:
             end_point.y - start_point.y,
         )
 
-    def screenshot(self) -> cv2.Mat:
+    @property
+    def subtract_list(self) -> List[dict]:
+        return self._subtract_list
+
+    @subtract_list.setter
+    def subtract_list(self, areas: List[dict]):
+        self._subtract_list = areas
+        self._subtract_slices = [(slice(a["top"], a["top"] + a["height"]), slice(a["left"], a["left"] + a["width"])) for a in areas]
+        self._mask = None
+
+    def exclude_polygon(self, points: List[Tuple[int, int]]) -> None:
+        """
+        Masks out the area inside a polygon during screenshotting.
+        Args:
+            points: The polygon's vertices [(x, y), ...] relative to the top-left of the Rectangle.
+        """
+        self._polygons = self._polygons + [(np.array(points, dtype=np.int32), False)]
+        self._mask = None
+
+    def keep_polygon(self, points: List[Tuple[int, int]]) -> None:
+        """
+        Masks out everything outside of a polygon during screenshotting. If called multiple times, the area inside
+        any of the polygons is kept.
+        Args:
+            points: The polygon's vertices [(x, y), ...] relative to the top-left of the Rectangle.
+        """
+        self._polygons = self._polygons + [(np.array(points, dtype=np.int32), True)]
+        self._mask = None
+
+    @property
+    def mask(self) -> Optional[np.ndarray]:
+        """
+        A single-channel mask the size of the Rectangle, where 255 marks pixels that are kept and 0 marks pixels that
+        are excluded by `subtract_list` or polygons. None if nothing is excluded. The mask is compiled once and reused,
+        so it must not be modified.
+        """
+        if not self._subtract_slices and not self._polygons:
+            return None
+        if self._mask is None or self._mask.shape != (self.height, self.width):
+            keep = [points for points, keep in self._polygons if keep]
+            mask = np.zeros((self.height, self.width), dtype=np.uint8)
+            if keep:
+                cv2.fillPoly(mask, keep, 255)
+            else:
+                mask[:] = 255
+            if exclude := [points for points, keep in self._polygons if not keep]:
+                cv2.fillPoly(mask, exclude, 0)
+            for rows, cols in self._subtract_slices:
+                mask[rows, cols] = 0
+            mask.flags.writeable = False
+            self._mask = mask
+        return self._mask
+
+    def screenshot(self, apply_mask: bool = True) -> cv2.Mat:
         """
         Screenshots the Rectangle.
+        Args:
+            apply_mask: Whether to black out the areas excluded by `subtract_list` and polygons. Pass False if you
+                        will apply `mask` yourself further down the pipeline (E.g., `clr.isolate_colors(..., mask=)`),
+                        which is cheaper on a single-channel image.
         Returns:
             A BGR Numpy array representing the captured image.
+        Notes:
+            If a frame is currently cached (see `utilities.capture.frame_cache`) and this Rectangle lies within it,
+            the result is a read-only view into that frame rather than a new capture. Copy it before modifying it.
         """
-        # with mss.mss() as sct:  # TODO: When MSS bug is fixed, reinstate this.
-        global sct  # TODO: When MSS bug is fixed, remove this.
         monitor = self.to_dict()
-        res = np.array(sct.grab(monitor))[:, :, :3]
-        if self.subtract_list:
-            for area in self.subtract_list:
-                res[
-                    area["top"] : area["top"] + area["height"],
-                    area["left"] : area["left"] + area["width"],
-                ] = 0
+        res = frame_cache.crop(monitor)
+        if not apply_mask or (not self._subtract_slices and not self._polygons):
+            return grab(monitor) if res is None else res
+        if self._polygons:
+            if res is None:
+                res = grab(monitor)
+            return cv2.bitwise_and(res, res, mask=self.mask)
+        res = grab(monitor) if res is None else res.copy()
+        for rows, cols in self._subtract_slices:
+            res[rows, cols] = 0
         return res
 
     def random_point(self, custom_seeds: List[List[int]] = None) -> Point:
@@ -164,6 +227,33 @@ class Rectangle:
             "height": self.height,
         }
 
+    def to_layout(self) -> dict:
+        """
+        Returns the Rectangle's position along with the areas it excludes (`subtract_list` and polygons), as plain
+        data suitable for JSON (see `Window.layout()`).
+        """
+        layout = {key: int(value) for key, value in self.to_dict().items()}
+        if self._subtract_list:
+            layout["subtract_list"] = [{key: int(value) for key, value in area.items()} for area in self._subtract_list]
+        if self._polygons:
+            layout["polygons"] = [{"points": points.tolist(), "keep": keep} for points, keep in self._polygons]
+        return layout
+
+    @classmethod
+    def from_layout(cls, layout: dict):
+        """
+        Creates a Rectangle from a dict returned by `to_layout()` (or `to_dict()`), restoring the areas it excludes.
+        """
+        rect = cls(layout["left"], layout["top"], layout["width"], layout["height"])
+        if "subtract_list" in layout:
+            rect.subtract_list = layout["subtract_list"]
+        for polygon in layout.get("polygons", []):
+            if polygon["keep"]:
+                rect.keep_polygon(polygon["points"])
+            else:
+                rect.exclude_polygon(polygon["points"])
+        return rect
+
     def __str__(self):
         return f"Rectangle(x={self.left}, y={self.top}, w={self.width}, h={self.height})"
 
@@ -172,9 +262,9 @@ class Rectangle:
 
 
 class RuneLiteObject:
-    rect = None
+    __slots__ = ("_x_min", "_x_max", "_y_min", "_y_max", "_width", "_height", "_center", "_mask", "_cdf", "rect")
 
-    def __init__(self, x_min, x_max, y_min, y_max, width, height, center, axis):
+    def __init__(self, x_min, x_max, y_min, y_max, width, height, center, axis=None, mask: np.ndarray = None):
         """
         Represents an outlined object on screen.
         Args:
@@ -184,6 +274,8 @@ class RuneLiteObject:
             height: The height of the object.
             center: The center of the object.
             axis: A 2-column stacked array of points that exist inside the object outline.
+            mask: Alternatively to `axis`, a boolean array of the object's bounding box (from y_min, x_min to y_max,
+                  x_max inclusive) that is True for points inside the object outline.
         """
         self._x_min = x_min
         self._x_max = x_max
@@ -192,7 +284,20 @@ class RuneLiteObject:
         self._width = width
         self._height = height
         self._center = center
-        self._axis = axis
+        if mask is None:
+            mask = np.zeros((y_max - y_min + 1, x_max - x_min + 1), dtype=bool)
+            mask[axis[:, 1] - y_min, axis[:, 0] - x_min] = True
+        self._mask = mask
+        self._cdf = None
+        self.rect = None
+
+    @property
+    def axis(self) -> np.ndarray:
+        """
+        A 2-column stacked array of the points inside the object outline, in row-major order.
+        """
+        ys, xs = np.nonzero(self._mask)
+        return np.column_stack((xs + self._x_min, ys + self._y_min))
 
     def set_rectangle_reference(self, rect: Rectangle):
         """
@@ -234,12 +339,34 @@ class RuneLiteObject:
                           a seeds list using RandomUtil's random_seeds() function with args.
                           Default: A random seed list based on current date and object position.
         Returns:
-            A random Point within the object.
+            A random Point within the object. If the seeded point falls outside of the outline (E.g., on a thin or
+            hollow object), a point is drawn from the object's own pixels instead, favoring those near its center.
         """
         if custom_seeds is None:
             custom_seeds = rd.random_seeds(mod=(self._center[0] + self._center[1]))
         x, y = rd.random_point_in(self._x_min, self._y_min, self._width, self._height, custom_seeds)
-        return self.__relative_point([x, y]) if self.__point_exists([x, y]) else self.center()
+        if self.__point_exists([x, y]):
+            return self.__relative_point([x, y])
+        return self.__relative_point(self.__sample())
+
+    def __sample(self) -> List[int]:
+        """
+        Draws a point from the object's pixels, weighted by a normal distribution around its center (with the same
+        spread as `rd.random_point_in`). The cumulative weights are computed on first use and kept.
+        Returns:
+            A point inside the object in the format [x, y].
+        """
+        if self._cdf is None:
+            h, w = self._mask.shape
+            sigma_x, sigma_y = max(w / 2 * 0.33, 1), max(h / 2 * 0.33, 1)
+            wx = np.exp(-0.5 * ((np.arange(w) + self._x_min - self._center[0]) / sigma_x) ** 2)
+            wy = np.exp(-0.5 * ((np.arange(h) + self._y_min - self._center[1]) / sigma_y) ** 2)
+            # Pixels far from the center can underflow to a weight of 0, so every pixel keeps a small floor
+            weights = (np.outer(wy, wx) + 1e-6) * self._mask
+            self._cdf = np.cumsum(weights.ravel())
+        index = int(np.searchsorted(self._cdf, np.random.random_sample() * self._cdf[-1], side="right"))
+        y, x = divmod(min(index, self._cdf.size - 1), self._mask.shape[1])
+        return [x + self._x_min, y + self._y_min]
 
     def __relative_point(self, point: List[int]) -> Point:
         """
@@ -257,4 +384,5 @@ class RuneLiteObject:
         Args:
             p: The point to check in the format [x, y].
         """
-        return (self._axis == np.array(p)).all(axis=1).any()
+        x, y = p[0] - self._x_min, p[1] - self._y_min
+        return 0 <= y < self._mask.shape[0] and 0 <= x < self._mask.shape[1] and bool(self._mask[y, x])
@@ -0,0 +1,320 @@
+"""
+An OCR engine for RuneLite's pixel-exact bitmap fonts. Rather than template matching every glyph of a font across
+the whole image, the color-isolated image is segmented into text lines and glyph columns, and each glyph is looked
+up in a precomputed index of the font's glyph bitmaps. The cost grows with the amount of text found rather than with
+font size times image area.
+
+Segments that cannot be identified (E.g., glyphs that touch each other), and the few glyphs that can also be found
+inside other glyphs, are handed to a fallback template matcher, so that the results are the same as those of the
+template engine in `utilities.ocr`.
+"""
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+# (char, top row of ink within the glyph, left column of ink within the glyph, glyph height, glyph width,
+#  number of ink pixels at or below each row of the glyph)
+Entry = Tuple[str, int, int, int, int, Tuple[int, ...]]
+
+# The correlation at which the template engine considers a glyph matched
+THRESHOLD = 0.98
+
+
+def _key(ink: np.ndarray) -> Tuple[int, int, bytes]:
+    """
+    Returns a hashable key for a tightly-cropped boolean glyph bitmap.
+    """
+    return (ink.shape[0], ink.shape[1], np.packbits(ink).tobytes())
+
+
+class GlyphIndex:
+    def __init__(self, font: Dict[str, np.ndarray]):
+        """
+        Indexes a font's glyphs by their tightly-cropped bitmaps.
+        Args:
+            font: A font dictionary of {"char": image} pairs (see `utilities.ocr`).
+        """
+        self.font = font
+        self.glyphs: Dict[Tuple[int, int, bytes], List[Entry]] = {}
+        self.max_ink_height = 0
+        self.max_ink_width = 0
+        self.cell_height = 0
+        self.cell_width = 0
+        self._aliases: Dict[int, Dict[str, List[str]]] = {}
+        self._fragments: Dict[int, List[str]] = {}
+        for char, glyph in font.items():
+            ink = glyph > 0
+            if char == " " or not ink.any():
+                continue
+            rows = np.flatnonzero(ink.any(axis=1))
+            cols = np.flatnonzero(ink.any(axis=0))
+            cropped = ink[rows[0] : rows[-1] + 1, cols[0] : cols[-1] + 1]
+            h, w = glyph.shape[:2]
+            counts = tuple(np.cumsum(np.count_nonzero(ink, axis=1)[::-1])[::-1].tolist())
+            self.glyphs.setdefault(_key(cropped), []).append((char, int(rows[0]), int(cols[0]), h, w, counts))
+            self.max_ink_height = max(self.max_ink_height, cropped.shape[0])
+            self.max_ink_width = max(self.max_ink_width, cropped.shape[1])
+            self.cell_height = max(self.cell_height, h)
+            self.cell_width = max(self.cell_width, w)
+
+    def lookup(self, ink: np.ndarray) -> List[Entry]:
+        """
+        Gets the glyphs whose bitmap is identical to a tightly-cropped boolean bitmap.
+        """
+        return self.glyphs.get(_key(ink), [])
+
+    def aliases(self, crop: int) -> Dict[str, List[str]]:
+        """
+        Gets the glyphs that the template engine also finds where each glyph is drawn, once `crop` rows are trimmed
+        from their top (E.g., "Â" where "Ä" is drawn, or near-identical glyphs in the larger fonts).
+        """
+        if crop not in self._aliases:
+            self.__analyze(crop)
+        return self._aliases[crop]
+
+    def fragments(self, crop: int) -> List[str]:
+        """
+        Gets the glyphs that, once `crop` rows are trimmed from their top, the template engine also finds within or
+        between other glyphs (E.g., the tip of an apostrophe). These can't be located by segmenting the image and
+        must be template matched.
+        """
+        if crop not in self._fragments:
+            self.__analyze(crop)
+        return self._fragments[crop]
+
+    def __analyze(self, crop: int):
+        # Render the whole font as a line of text and template match each glyph against it
+        chars = [char for char in self.font if char != " "]
+        line = np.hstack([np.pad(self.font[char], ((0, self.cell_height - self.font[char].shape[0]), (0, 0))) for char in chars])
+        canvas = np.pad(line, ((self.cell_height, self.cell_height), (self.cell_width, self.cell_width)))
+        lefts = np.cumsum([self.cell_width] + [self.font[char].shape[1] for char in chars]).tolist()
+        cells = {(self.cell_height + crop, left): char for char, left in zip(chars, lefts)}
+        aliases = {char: [] for char in self.font}
+        fragments = []
+        for char in chars:
+            template = self.font[char][crop:]
+            if not template.any():
+                fragments.append(char)
+                continue
+            y_mins, x_mins = np.where(cv2.matchTemplate(canvas, template, cv2.TM_CCOEFF_NORMED) >= THRESHOLD)
+            for y, x in zip(y_mins.tolist(), x_mins.tolist()):
+                other = cells.get((y, x))
+                if other is None:
+                    fragments.append(char)
+                    break
+                if other != char:
+                    aliases[other].append(char)
+        self._aliases[crop] = aliases
+        self._fragments[crop] = fragments
+
+
+_indexes: Dict[int, GlyphIndex] = {}
+
+
+def get_index(font: Dict[str, np.ndarray]) -> GlyphIndex:
+    """
+    Returns the GlyphIndex for a font, building it on first use.
+    """
+    index = _indexes.get(id(font))
+    if index is None or index.font is not font:
+        index = _indexes[id(font)] = GlyphIndex(font)
+    return index
+
+
+def __clusters(stats: np.ndarray, max_width: int, max_height: int) -> List[List[int]]:
+    """
+    Groups connected components into glyphs. Components whose columns overlap (E.g., the dot and stem of an "i", or
+    an accent and its letter) are merged, closest first, as long as the merged bounding box fits within a glyph.
+    Args:
+        stats: The stats returned by `cv2.connectedComponentsWithStats`, excluding the background.
+        max_width: The width of the widest glyph.
+        max_height: The height of the tallest glyph.
+    Returns:
+        A list of clusters, each a list of component indices.
+    """
+    boxes = [[int(x), int(y), int(x + w - 1), int(y + h - 1)] for x, y, w, h, _ in stats]
+    by_left = sorted(range(len(boxes)), key=lambda i: boxes[i][0])
+    pairs = []
+    for n, i in enumerate(by_left):
+        for j in by_left[n + 1 :]:
+            if boxes[j][0] > boxes[i][2] + 1:
+                break
+            gap = max(boxes[j][1] - boxes[i][3], boxes[i][1] - boxes[j][3])
+            pairs.append((gap, i, j))
+    parent = list(range(len(boxes)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for _, i, j in sorted(pairs):
+        i, j = root(i), root(j)
+        if i == j:
+            continue
+        a, b = boxes[i], boxes[j]
+        merged = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+        if merged[2] - merged[0] < max_width and merged[3] - merged[1] < max_height:
+            parent[j] = i
+            boxes[i] = merged
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(boxes)):
+        clusters.setdefault(root(i), []).append(i)
+    return list(clusters.values())
+
+
+def match_chars(
+    image: np.ndarray,
+    font: Dict[str, np.ndarray],
+    chars: Sequence[str],
+    crop: int,
+    fallback: Callable[[np.ndarray, List[str]], List[list]] = None,
+) -> List[list]:
+    """
+    Locates the given characters of a font in a color-isolated image.
+    Args:
+        image: A single-channel image where text pixels are non-zero (E.g., the output of `clr.isolate_colors`).
+        font: The font dictionary to read.
+        chars: The characters to search for, in the order the template engine would search for them.
+        crop: The number of rows trimmed from the top of each glyph by the template engine. Reported positions are
+              offset by this amount so they are identical to those of the template engine.
+        fallback: A function that template matches a list of characters in an image, returning [[char, x, y], ...].
+                  It is used for segments that are not in the index, and for fragment glyphs. If None, these are
+                  skipped.
+    Returns:
+        A list of [char, x, y] entries, where (x, y) is the position of the glyph's (cropped) template in the image,
+        sorted by position.
+    """
+    index = get_index(font)
+    aliases = index.aliases(crop)
+    order = {char: i for i, char in enumerate(chars)}
+    gray = image.reshape(image.shape[0], image.shape[1])
+    ink = gray > 0
+    img_h, img_w = ink.shape
+    char_list = []
+    seen = set()
+
+    def add(char: str, x: int, y: int):
+        if char in order and (char, x, y) not in seen:
+            seen.add((char, x, y))
+            char_list.append([char, x, y])
+
+    def score(char: str, x: int, y: int) -> float:
+        """
+        Returns the template engine's correlation for a glyph whose cell is at (x, y).
+        """
+        template = font[char][crop:]
+        window = gray[y + crop : y + crop + template.shape[0], x : x + template.shape[1]]
+        return cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)[0, 0]
+
+    def emit(piece: np.ndarray, top: int, left: int) -> bool:
+        """
+        Looks up a tightly-cropped piece of ink, adding each glyph that the template engine would also find there.
+        Returns whether any glyph was found.
+        """
+        found = False
+        for char, ink_top, ink_left, h, w, counts in index.lookup(piece):
+            x, y = left - ink_left, top - ink_top
+            # The template engine only finds glyphs whose whole (cropped) template lies within the image. If there
+            # are other text pixels in the template area, the match must still score above its threshold.
+            if x < 0 or y + crop < 0 or x + w > img_w or y + h > img_h:
+                continue
+            if np.count_nonzero(ink[y + crop : y + h, x : x + w]) == counts[crop] or score(char, x, y) >= THRESHOLD:
+                add(char, x, y + crop)
+                found = True
+            for alias in aliases[char]:
+                alias_h, alias_w = font[alias].shape[:2]
+                if alias in order and x + alias_w <= img_w and y + alias_h <= img_h and score(alias, x, y) >= THRESHOLD:
+                    add(alias, x, y + crop)
+        return found
+
+    if fallback is not None:
+        fragments = [char for char in index.fragments(crop) if char in order]
+        if fragments:
+            for char, x, y in fallback(image, fragments):
+                add(char, int(x), int(y))
+
+    # Segment the image into glyphs and look each one up in the index
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink.view(np.uint8), connectivity=8)
+    stats = stats[1:]
+    for cluster in __clusters(stats, index.max_ink_width, index.max_ink_height):
+        left = int(min(stats[i][0] for i in cluster))
+        top = int(min(stats[i][1] for i in cluster))
+        right = int(max(stats[i][0] + stats[i][2] for i in cluster))
+        bottom = int(max(stats[i][1] + stats[i][3] for i in cluster))
+        piece = np.isin(labels[top:bottom, left:right], [i + 1 for i in cluster])
+        # Parts of a glyph (E.g., an accent) may also be glyphs of their own when the rows above them are cropped away
+        parts = (
+            [(piece, top, left)]
+            if len(cluster) == 1
+            else [(piece, top, left)] + [(labels[y : y + h, x : x + w] == i + 1, y, x) for i, (x, y, w, h, _) in ((i, stats[i].tolist()) for i in cluster)]
+        )
+        found = [emit(*part) for part in parts]
+        if found[0] or (len(found) > 1 and all(found[1:])) or fallback is None:
+            continue
+        # Template match the area around the unidentified glyph, keeping the glyphs that overlap it
+        x0, y0 = max(0, left - index.cell_width), max(0, top - index.cell_height)
+        x1, y1 = min(img_w, right + index.cell_width), min(img_h, bottom + index.cell_height)
+        for char, x, y in fallback(image[y0:y1, x0:x1], list(order)):
+            x, y = int(x) + x0, int(y) + y0
+            if x < right and x + index.cell_width > left and y < bottom and y + index.cell_height > top:
+                add(char, x, y)
+
+    # Glyphs found at the same position are ordered as the template engine would (by the order they were searched for)
+    char_list.sort(key=lambda entry: (entry[2], entry[1], order[entry[0]]))
+    return char_list
+
+
+if __name__ == "__main__":
+    """
+    Run this file directly to compare the glyph and stacked engines against the template engine on rendered text.
+    No game client is required.
+    """
+    import time
+
+    import utilities.color as clr
+    import utilities.ocr as ocr
+
+    def render(font: dict, lines: List[str], width: int, height: int, line_height: int) -> np.ndarray:
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        y = 2
+        for line in lines:
+            x = 3
+            for char in line:
+                glyph = font[char]
+                h, w = glyph.shape[:2]
+                image[y : y + h, x : x + w][glyph > 0] = 255
+                x += w
+            y += line_height
+        return image
+
+    def bench(func, *args, runs=10):
+        func(*args)  # Warm up (builds the glyph index or stack)
+        start = time.perf_counter()
+        for _ in range(runs):
+            result = func(*args)
+        return result, (time.perf_counter() - start) / runs * 1000
+
+    text = ["Welcome to Old School RuneScape", "You swing your axe at the tree", "You get some oak logs", "Your inventory is too full"]
+    cases = {
+        "mouseover (407x26, BOLD_12)": (ocr.BOLD_12, ["Chop down Oak tree / 2 more options"], 407, 26, 14),
+        "chat (506x130, PLAIN_12)": (ocr.PLAIN_12, text, 506, 130, 14),
+        "game view (512x334, PLAIN_12)": (ocr.PLAIN_12, text * 5, 512, 334, 16),
+        "game view (512x334, BOLD_12)": (ocr.BOLD_12, text * 5, 512, 334, 16),
+    }
+    for name, (font, lines, width, height, line_height) in cases.items():
+        image = render(font, lines, width, height, line_height)
+        template, template_ms = bench(ocr.extract_text, image, font, clr.WHITE, ocr.problematic_chars, ocr.TEMPLATE)
+        results = [f"template {template_ms:.2f} ms"]
+        for engine in (ocr.GLYPH, ocr.STACKED):
+            text_read, engine_ms = bench(ocr.extract_text, image, font, clr.WHITE, ocr.problematic_chars, engine)
+            results.append(f"{engine} {engine_ms:.2f} ms ({template_ms / engine_ms:.1f}x, identical: {template == text_read})")
+        print(f"{name}: {', '.join(results)}")
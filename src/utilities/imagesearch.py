@@ -1,8 +1,13 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple, Union
 
 import cv2
+import numpy as np
 
+from utilities.cache import MISS, LRUCache
 from utilities.geometry import Point, Rectangle
 
 # --- Paths to Image folders ---
@@ -10,41 +15,216 @@ __PATH = Path(__file__).parent.parent
 IMAGES = __PATH.joinpath("images")
 BOT_IMAGES = IMAGES.joinpath("bot")
 
+# Preprocessed (base image, 3-channel mask) pairs for templates loaded from disk, keyed by path and modification time
+# so that edited images are reloaded. Use `template_cache.stats()` to tune its limits.
+template_cache = LRUCache(max_entries=256, max_bytes=64 * 1024 * 1024)
 
-def __imagesearcharea(template: Union[cv2.Mat, str, Path], im: cv2.Mat, confidence: float) -> Rectangle:
+# Where each template was last found in each search area, used by searches with `remember=True`
+location_hints = LRUCache(max_entries=1024)
+# The margin around a previous location that is searched before the full area, in pixels
+HINT_MARGIN = 8
+
+# The number of threads `search_many` uses
+SEARCH_THREADS = min(4, os.cpu_count() or 1)
+# The minimum area searched by `search_many` for it to use threads, in pixels
+PARALLEL_MIN_PIXELS = 128 * 128
+_executor: ThreadPoolExecutor = None
+_executor_lock = threading.Lock()
+
+# --- Pyramid search ---
+# The factor by which images are downscaled to find candidates
+PYRAMID_FACTOR = 4
+# The minimum size of a downscaled template, in pixels
+PYRAMID_MIN_SIZE = 8
+# The number of candidates verified at full resolution
+PYRAMID_CANDIDATES = 3
+
+
+def __prepare(template: cv2.Mat) -> Tuple[cv2.Mat, cv2.Mat]:
     """
-    Locates an image within another image.
-    Args:
-        template: The image to search for.
-        im: The image to search in.
-        confidence: The confidence level of the search in range 0 to 1, where 0 is a perfect match.
-    Returns:
-        A Rectangle outlining the found template inside the image.
+    Splits a template into its BGR base image and a 3-channel mask of its alpha channel.
     """
     # If image doesn't have an alpha channel, convert it from BGR to BGRA
     if len(template.shape) < 3 or template.shape[2] != 4:
         template = cv2.cvtColor(template, cv2.COLOR_BGR2BGRA)
-    # Get template dimensions
-    hh, ww = template.shape[:2]
     # Extract base image and alpha channel
     base = template[:, :, 0:3]
     alpha = template[:, :, 3]
     alpha = cv2.merge([alpha, alpha, alpha])
+    return base, alpha
+
+
+def __load(path: Union[str, Path]) -> Tuple[cv2.Mat, cv2.Mat]:
+    """
+    Reads and prepares a template from disk, reusing the cached result if the file hasn't changed since.
+    """
+    path = Path(path).resolve()
+    key = (str(path), path.stat().st_mtime_ns)
+
+    def load():
+        base, alpha = __prepare(cv2.imread(str(path), cv2.IMREAD_UNCHANGED))
+        # Cached arrays are shared, so guard them against accidental modification
+        base.flags.writeable = False
+        alpha.flags.writeable = False
+        return base, alpha
+
+    return template_cache.cached(key, load, size=lambda prepared: prepared[0].nbytes + prepared[1].nbytes)
+
+
+def __downscale(template: Tuple[cv2.Mat, cv2.Mat], factor: int) -> Tuple[cv2.Mat, cv2.Mat]:
+    """
+    Shrinks a prepared template to a grayscale image and single-channel mask for the coarse level of a pyramid search.
+    """
+    base, alpha = template
+    size = (max(1, base.shape[1] // factor), max(1, base.shape[0] // factor))
+    small = cv2.cvtColor(cv2.resize(base, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    # Only pixels that are fully opaque in the original are kept, as partly transparent ones blend in the background
+    small_alpha = cv2.resize(alpha[:, :, 0], size, interpolation=cv2.INTER_AREA)
+    small_alpha[small_alpha < 255] = 0
+    return small, small_alpha
+
+
+def __load_coarse(path: Union[str, Path], factor: int) -> Tuple[cv2.Mat, cv2.Mat]:
+    """
+    Returns the downscaled template for a pyramid search, reusing the cached result if the file hasn't changed since.
+    """
+    path = Path(path).resolve()
+    key = (str(path), path.stat().st_mtime_ns, factor)
+    return template_cache.cached(key, lambda: __downscale(__load(path), factor), size=lambda prepared: prepared[0].nbytes + prepared[1].nbytes)
+
+
+def preload(paths: Union[str, Path, Iterable[Union[str, Path]]] = BOT_IMAGES.joinpath("ui_templates")) -> int:
+    """
+    Loads templates into the cache ahead of time so that the first searches for them don't read from disk.
+    Args:
+        paths: An image, a folder of images (searched recursively), or a list of either. Defaults to the UI templates
+               used to initialize the game window.
+    Returns:
+        The number of templates loaded.
+    """
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    count = 0
+    for path in map(Path, paths):
+        for file in sorted(path.rglob("*.png")) if path.is_dir() else [path]:
+            __load(file)
+            count += 1
+    return count
+
+
+def __correlate(template: Tuple[cv2.Mat, cv2.Mat], im: cv2.Mat) -> np.ndarray:
+    """
+    Computes the masked squared-difference map of a template over an image, where 0 is a perfect match.
+    """
+    base, alpha = template
+    return cv2.matchTemplate(im, base, cv2.TM_SQDIFF_NORMED, mask=alpha)
+
 
-    correlation = cv2.matchTemplate(im, base, cv2.TM_SQDIFF_NORMED, mask=alpha)
+def __imagesearcharea(template: Tuple[cv2.Mat, cv2.Mat], im: cv2.Mat, confidence: float) -> Rectangle:
+    """
+    Locates an image within another image.
+    Args:
+        template: The (base image, mask) pair of the image to search for (see `__prepare`).
+        im: The image to search in.
+        confidence: The confidence level of the search in range 0 to 1, where 0 is a perfect match.
+    Returns:
+        A Rectangle outlining the found template inside the image.
+    """
+    base, alpha = template
+    # Get template dimensions
+    hh, ww = base.shape[:2]
+
+    correlation = __correlate(template, im)
     min_val, _, min_loc, _ = cv2.minMaxLoc(correlation)
     if min_val < confidence:
         return Rectangle.from_points(Point(min_loc[0], min_loc[1]), Point(min_loc[0] + ww, min_loc[1] + hh))
     return None
 
 
-def search_img_in_rect(image: Union[cv2.Mat, str, Path], rect: Union[Rectangle, cv2.Mat], confidence=0.15) -> Rectangle:
+def __pyramidsearcharea(template: Tuple[cv2.Mat, cv2.Mat], coarse: Tuple[cv2.Mat, cv2.Mat], im: cv2.Mat, confidence: float, factor: int) -> Rectangle:
+    """
+    Locates an image within another image by finding candidate positions on a downscaled grayscale copy of both, then
+    searching only the neighborhoods of the best candidates at full resolution. Falls back to a full search if none
+    of the candidates match, so an image that `__imagesearcharea` would find is never missed.
+
+    The result is the best match among the verified candidates, which is not necessarily the best match in the whole
+    image: if several positions pass `confidence` (E.g., the image appears more than once), a different one than
+    `__imagesearcharea` returns may be chosen. When the image isn't present, the coarse pass is wasted and this is
+    slower than a full search alone.
+    Args:
+        template: The (base image, mask) pair of the image to search for (see `__prepare`).
+        coarse: The downscaled template (see `__downscale`).
+        im: The image to search in.
+        confidence: The confidence level of the search in range 0 to 1, where 0 is a perfect match.
+        factor: The factor the template and image are downscaled by.
+    Returns:
+        A Rectangle outlining the found template inside the image.
+    """
+    hh, ww = template[0].shape[:2]
+    small_h, small_w = im.shape[0] // factor, im.shape[1] // factor
+    if small_h < coarse[0].shape[0] or small_w < coarse[0].shape[1] or not coarse[1].any():
+        return __imagesearcharea(template, im, confidence)
+    small = cv2.cvtColor(cv2.resize(im, (small_w, small_h), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    correlation = cv2.matchTemplate(small, coarse[0], cv2.TM_SQDIFF_NORMED, mask=coarse[1])
+    correlation[~np.isfinite(correlation)] = np.inf
+
+    best = None
+    for _ in range(PYRAMID_CANDIDATES):
+        score, _, (x, y), _ = cv2.minMaxLoc(correlation)
+        if not np.isfinite(score):
+            break
+        # Suppress this candidate's neighborhood so the next one is elsewhere
+        correlation[max(0, y - 2) : y + 3, max(0, x - 2) : x + 3] = np.inf
+        # Search a margin of `factor` pixels around the candidate at full resolution
+        left, top = max(0, (x - 1) * factor), max(0, (y - 1) * factor)
+        region = im[top : top + hh + 3 * factor, left : left + ww + 3 * factor]
+        if region.shape[0] < hh or region.shape[1] < ww:
+            continue
+        min_val, _, min_loc, _ = cv2.minMaxLoc(__correlate(template, region))
+        if min_val < confidence and (best is None or min_val < best[0]):
+            best = (min_val, left + min_loc[0], top + min_loc[1])
+    if best is None:
+        return __imagesearcharea(template, im, confidence)
+    _, left, top = best
+    return Rectangle(left, top, ww, hh)
+
+
+def __hintsearcharea(template: Tuple[cv2.Mat, cv2.Mat], im: cv2.Mat, confidence: float, hint: Tuple[int, int]) -> Rectangle:
+    """
+    Locates an image within the neighborhood of a previous location in another image.
+    Args:
+        template: The (base image, mask) pair of the image to search for (see `__prepare`).
+        im: The image to search in.
+        confidence: The confidence level of the search in range 0 to 1, where 0 is a perfect match.
+        hint: The (left, top) position the image was previously found at.
+    Returns:
+        A Rectangle outlining the found template inside the image.
+    """
+    hh, ww = template[0].shape[:2]
+    left, top = max(0, hint[0] - HINT_MARGIN), max(0, hint[1] - HINT_MARGIN)
+    region = im[top : top + hh + 2 * HINT_MARGIN, left : left + ww + 2 * HINT_MARGIN]
+    if region.shape[0] < hh or region.shape[1] < ww:
+        return None
+    if found_rect := __imagesearcharea(template, region, confidence):
+        found_rect.left += left
+        found_rect.top += top
+    return found_rect
+
+
+def search_img_in_rect(image: Union[cv2.Mat, str, Path], rect: Union[Rectangle, cv2.Mat], confidence=0.15, pyramid=False, remember=False) -> Rectangle:
     """
     Searches for an image in a rectangle. This function works with images containing transparency (sprites).
     Args:
         image: The image to search for (can be a path or matrix).
         rect: The Rectangle to search in (can be a Rectangle or a matrix).
         confidence: The confidence level of the search in range 0 to 1, where 0 is a perfect match.
+        pyramid: Whether to locate candidates on a downscaled copy of the images first. This is much faster for large
+                 images in large areas (E.g., UI templates in the client window). If the image isn't present, the
+                 downscaled search is followed by a full one, so this is slower than a normal search. If the image
+                 appears more than once, any of the matching positions may be returned rather than the best one.
+                 Images smaller than PYRAMID_FACTOR * PYRAMID_MIN_SIZE pixels are always searched normally.
+        remember: Whether to search near where the image was last found in this area first, and only search the whole
+                  area if it isn't there. Only applies to images supplied as a path.
     Returns:
         A Rectangle outlining the found image relative to the container, or None.
     Notes:
@@ -53,21 +233,183 @@ def search_img_in_rect(image: Union[cv2.Mat, str, Path], rect: Union[Rectangle,
         Rectangle is not suitable for use with mouse movement/clicks, as it will not be relative to the game window.
         However, you will still be able to confirm if the image was found or not. This is useful in cases where you take a static
         screenshot and want to search for a series of images to verify that they are present.
+
+        Images supplied as a path are cached after the first search (see `template_cache`), so repeated searches don't
+        re-read the file.
+
+        With `remember=True`, a match near the previous location is returned even if a better one exists elsewhere.
+        Use it for images that appear at most once in the area (E.g., UI buttons).
     Examples:
         >>> deposit_all_btn = search_img_in_rect(BOT_IMAGES.joinpath("bank", "deposit.png"), self.win.game_view)
         >>> if deposit_all_btn:
         >>>     # Deposit all button was found
     """
-    if isinstance(image, str):
-        image = cv2.imread(image, cv2.IMREAD_UNCHANGED)
-    elif isinstance(image, Path):
-        image = cv2.imread(str(image), cv2.IMREAD_UNCHANGED)
     im = rect.screenshot() if isinstance(rect, Rectangle) else rect
+    return __search(image, im, rect, confidence, pyramid, remember)
+
 
-    if found_rect := __imagesearcharea(image, im, confidence):
+def __search(image: Union[cv2.Mat, str, Path], im: cv2.Mat, rect: Union[Rectangle, cv2.Mat], confidence: float, pyramid: bool, remember: bool) -> Rectangle:
+    """
+    Searches for an image in a screenshot of a rectangle (see `search_img_in_rect`).
+    """
+    template = __load(image) if isinstance(image, (str, Path)) else __prepare(image)
+
+    found_rect = None
+    hint_key = None
+    if remember and isinstance(image, (str, Path)):
+        area = (rect.left, rect.top, rect.width, rect.height) if isinstance(rect, Rectangle) else im.shape[:2]
+        hint_key = (str(image), area)
+        if (hint := location_hints.get(hint_key)) is not MISS:
+            found_rect = __hintsearcharea(template, im, confidence, hint)
+    if found_rect is None:
+        if pyramid and min(template[0].shape[:2]) >= PYRAMID_FACTOR * PYRAMID_MIN_SIZE:
+            coarse = __load_coarse(image, PYRAMID_FACTOR) if isinstance(image, (str, Path)) else __downscale(template, PYRAMID_FACTOR)
+            found_rect = __pyramidsearcharea(template, coarse, im, confidence, PYRAMID_FACTOR)
+        else:
+            found_rect = __imagesearcharea(template, im, confidence)
+    if found_rect:
+        if hint_key is not None:
+            location_hints.put(hint_key, (found_rect.left, found_rect.top), size=0)
         if isinstance(rect, Rectangle):
             found_rect.left += rect.left
             found_rect.top += rect.top
         return found_rect
     else:
         return None
+
+
+def search_many(
+    images: Union[Sequence[Union[str, Path]], Dict[Hashable, Union[cv2.Mat, str, Path]]],
+    rect: Union[Rectangle, cv2.Mat],
+    confidence=0.15,
+    first=False,
+    pyramid=False,
+    remember=False,
+) -> Dict[Hashable, Rectangle]:
+    """
+    Searches for several images in a single screenshot of a rectangle. The searches run in parallel, as OpenCV
+    releases the GIL while matching, unless `first` is True.
+    Args:
+        images: The images to search for, as a list of paths or a dictionary of {key: path or matrix} pairs.
+        rect: The Rectangle to search in (can be a Rectangle or a matrix).
+        confidence: The confidence level of the search in range 0 to 1, where 0 is a perfect match.
+        first: Whether to stop at the first image (in the order given) that is found. The images are then searched one
+               at a time, so that no work is spent on images after the first match.
+        pyramid: See `search_img_in_rect`.
+        remember: See `search_img_in_rect`.
+    Returns:
+        A dictionary of {image: Rectangle or None} pairs, keyed by path or by the keys of `images`. If `first` is True,
+        images after the first one found are not searched and are left out.
+    Examples:
+        >>> clicks = [BOT_IMAGES.joinpath("mouse_clicks", f"red_{i}.png") for i in range(1, 5)]
+        >>> if any(search_many(clicks, cursor_rect, first=True).values()):
+        >>>     # The click was red
+    """
+    if not isinstance(images, dict):
+        images = {image: image for image in images}
+    im = rect.screenshot() if isinstance(rect, Rectangle) else rect
+    found = {}
+    # Small searches are faster than handing them to other threads. When only the first match is wanted, a search
+    # that has already started in another thread can't be stopped, so searching in parallel would waste the work.
+    if first or len(images) == 1 or im.shape[0] * im.shape[1] < PARALLEL_MIN_PIXELS:
+        for key, image in images.items():
+            found[key] = __search(image, im, rect, confidence, pyramid, remember)
+            if first and found[key]:
+                break
+        return found
+    futures = {key: __executor().submit(__search, image, im, rect, confidence, pyramid, remember) for key, image in images.items()}
+    for key, future in futures.items():
+        found[key] = future.result()
+    return found
+
+
+def __executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool used by `search_many`, creating it on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="imagesearch")
+        return _executor
+
+
+def search_all_in_rect(image: Union[cv2.Mat, str, Path], rect: Union[Rectangle, cv2.Mat], confidence=0.15) -> List[Rectangle]:
+    """
+    Searches for every instance of an image in a rectangle. This function works with images containing transparency
+    (sprites).
+    Args:
+        image: The image to search for (can be a path or matrix).
+        rect: The Rectangle to search in (can be a Rectangle or a matrix).
+        confidence: The confidence level of the search in range 0 to 1, where 0 is a perfect match.
+    Returns:
+        A list of Rectangles outlining the found images relative to the container, best match first. Matches never
+        overlap; where two would, only the better one is kept.
+    Notes:
+        As with `search_img_in_rect`, Rectangles found in a matrix are relative to the top-left corner of the matrix.
+    Examples:
+        >>> coin_pouches = search_all_in_rect(BOT_IMAGES.joinpath("items", "coin_pouch.png"), self.win.control_panel)
+        >>> print(f"Carrying {len(coin_pouches)} coin pouches")
+    """
+    template = __load(image) if isinstance(image, (str, Path)) else __prepare(image)
+    im = rect.screenshot() if isinstance(rect, Rectangle) else rect
+    hh, ww = template[0].shape[:2]
+
+    correlation = __correlate(template, im)
+    correlation[~np.isfinite(correlation)] = 1
+    # Only local minima below the threshold are candidates, which discards the slopes around each match
+    minima = correlation == cv2.erode(correlation, np.ones((3, 3), dtype=np.uint8))
+    ys, xs = np.nonzero(minima & (correlation < confidence))
+    order = np.argsort(correlation[ys, xs], kind="stable")
+    ys, xs = ys[order], xs[order]
+
+    # Non-maximum suppression: accept the best remaining candidate and discard any that overlap it
+    found = []
+    alive = np.ones(len(ys), dtype=bool)
+    for i in range(len(ys)):
+        if not alive[i]:
+            continue
+        alive[i:] &= (np.abs(xs[i:] - xs[i]) >= ww) | (np.abs(ys[i:] - ys[i]) >= hh)
+        left, top = int(xs[i]), int(ys[i])
+        if isinstance(rect, Rectangle):
+            left += rect.left
+            top += rect.top
+        found.append(Rectangle(left, top, ww, hh))
+    return found
+
+
+if __name__ == "__main__":
+    """
+    Run this file directly to compare full and pyramid searches for the UI templates on synthetic client frames.
+    No game client is required.
+    """
+    import time
+
+    def bench(func, *args, runs=3):
+        func(*args)  # Warm up (loads the template)
+        start = time.perf_counter()
+        for _ in range(runs):
+            result = func(*args)
+        return result, (time.perf_counter() - start) / runs * 1000
+
+    rng = np.random.default_rng(0)
+    templates = ["chat", "inv", "minimap"]
+    for width, height in [(1920, 1080), (2560, 1440)]:
+        # A smooth, noisy background with the UI templates composited into the corners, as in a resizable client
+        client = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+        positions = {"chat": (height - 165, 0), "inv": (height - 336, width - 243), "minimap": (0, width - 212)}
+        paths = {name: BOT_IMAGES.joinpath("ui_templates", f"{name}.png") for name in templates}
+        for name, (y, x) in positions.items():
+            sprite = cv2.imread(str(paths[name]), cv2.IMREAD_UNCHANGED)
+            region = client[y : y + sprite.shape[0], x : x + sprite.shape[1]]
+            opaque = sprite[:, :, 3] > 0
+            region[opaque] = sprite[:, :, :3][opaque]
+        total_full = total_pyramid = 0
+        for name in templates:
+            full, full_ms = bench(search_img_in_rect, paths[name], client)
+            fast, fast_ms = bench(search_img_in_rect, paths[name], client, 0.15, True)
+            total_full += full_ms
+            total_pyramid += fast_ms
+            same = (full.left, full.top) == (fast.left, fast.top) if full and fast else full is fast
+            print(f"{width}x{height} {name}: full {full_ms:.0f} ms, pyramid {fast_ms:.1f} ms, identical: {same}")
+        print(f"{width}x{height} total: full {total_full:.0f} ms, pyramid {total_pyramid:.1f} ms ({total_full / total_pyramid:.0f}x)")
@@ -0,0 +1,88 @@
+"""
+Reads the contents of the inventory from the screen, without relying on a RuneLite plugin.
+
+The control panel is captured once, the 28 slots are sliced out of it, and every slot is identified in one batch
+against the sprite index (see `utilities.sprite_index`).
+
+Example:
+    >>> inv = inventory.read(self.win, stacks=True)
+    >>> names = inventory.names(inv)
+    >>> if (inv["item"] == inventory.EMPTY).any():
+    >>>     # There is room in the inventory
+"""
+from typing import List, Optional
+
+import numpy as np
+
+import utilities.color as clr
+import utilities.ocr as ocr
+import utilities.sprite_index as sprite_index
+from utilities.window import Window
+
+# Item values of slots that are empty, or hold an item that isn't in the sprite index
+EMPTY = -1
+UNKNOWN = -2
+
+# One record per slot: the position of its item in `SpriteIndex.names` (or EMPTY/UNKNOWN), and its stack size
+SLOT_DTYPE = np.dtype([("item", np.int32), ("stack", np.int32)])
+
+# The rows at the top of a slot that are read for a stack number, and the numbers' colors and multipliers. The digits'
+# ink only covers the rows that sprite matching ignores (`sprite_index.STACK_ROWS`), but OCR needs the full 12-row
+# PLAIN_11 glyph cell to match.
+STACK_OCR_ROWS = 12
+STACK_COLORS = [(clr.YELLOW, 1), (clr.WHITE, 1_000), (clr.OFF_GREEN, 1_000_000)]
+
+
+def read(win: Window, stacks: bool = False, index: sprite_index.SpriteIndex = None) -> np.ndarray:
+    """
+    Identifies the item in every inventory slot from a single screenshot of the control panel.
+    Args:
+        win: The initialized game window.
+        stacks: Whether to read stack sizes. This is slower, as each occupied slot is read with OCR.
+        index: The sprite index to identify items with. Defaults to `sprite_index.get_index()`.
+    Returns:
+        An array of 28 SLOT_DTYPE records, in slot order. Stack sizes are 0 for empty slots, and 1 for occupied slots
+        unless `stacks` is True and a number was read. Stack sizes shown as "K" or "M" are read to that precision.
+    """
+    if index is None:
+        index = sprite_index.get_index()
+    cp = win.control_panel
+    image = cp.screenshot(apply_mask=False)
+    slots = np.stack(
+        [image[rect.top - cp.top : rect.top - cp.top + rect.height, rect.left - cp.left : rect.left - cp.left + rect.width] for rect in win.inventory_slots]
+    )
+    vectors, present = sprite_index.slot_features_many(slots)
+
+    inventory = np.zeros(len(slots), dtype=SLOT_DTYPE)
+    inventory["item"] = EMPTY
+    matches = index.match_many(vectors[present])
+    inventory["item"][present] = np.where(matches >= 0, matches, UNKNOWN)
+    inventory["stack"][present] = 1
+    if stacks:
+        for i in np.nonzero(present)[0]:
+            if (stack := read_stack(slots[i])) is not None:
+                inventory["stack"][i] = stack
+    return inventory
+
+
+def read_stack(slot: np.ndarray) -> Optional[int]:
+    """
+    Reads the stack size drawn in the corner of a slot.
+    Args:
+        slot: A BGR screenshot of a slot.
+    Returns:
+        The stack size, or None if there is no number.
+    """
+    for color, multiplier in STACK_COLORS:
+        if (number := ocr.read_int(slot[:STACK_OCR_ROWS], ocr.PLAIN_11, color)) is not None:
+            return number * multiplier
+    return None
+
+
+def names(inventory: np.ndarray, index: sprite_index.SpriteIndex = None) -> List[Optional[str]]:
+    """
+    Returns the item name in each slot of an inventory returned by `read`, or None for empty or unknown slots.
+    """
+    if index is None:
+        index = sprite_index.get_index()
+    return [index.names[item] if item >= 0 else None for item in inventory["item"].tolist()]
@@ -11,9 +11,15 @@ import utilities.imagesearch as imsearch
 from utilities.geometry import Point, Rectangle
 from utilities.random_util import truncated_normal_sample
 
+# The range of the number of points in a movement's curve (targetPoints) for each mouse speed
+MOUSE_SPEEDS = {"slowest": (85, 100), "slow": (65, 80), "medium": (45, 60), "fast": (20, 40), "fastest": (10, 15)}
+# The weight of the latest movement in `Mouse.step_duration`
+STEP_DURATION_SMOOTHING = 0.3
+
 
 class Mouse:
     click_delay = True
+    step_duration = pag.PAUSE  # The average time each point of a movement takes, in seconds, measured by `move_to`
 
     def move_to(self, destination: tuple, **kwargs):
         """
@@ -41,8 +47,9 @@ class Mouse:
         dest_x = destination[0]
         dest_y = destination[1]
 
+        start = time.perf_counter()
         start_x, start_y = pag.position()
-        for curve_x, curve_y in HumanCurve(
+        points = HumanCurve(
             (start_x, start_y),
             (dest_x, dest_y),
             offsetBoundaryX=offsetBoundaryX,
@@ -53,9 +60,32 @@ class Mouse:
             distortionFrequency=distortionFrequency,
             tween=tween,
             targetPoints=mouseSpeed,
-        ).points:
+        ).points
+        for curve_x, curve_y in points:
             pag.moveTo((curve_x, curve_y))
             start_x, start_y = curve_x, curve_y
+        if len(points):
+            step = (time.perf_counter() - start) / len(points)
+            self.step_duration = STEP_DURATION_SMOOTHING * step + (1 - STEP_DURATION_SMOOTHING) * self.step_duration
+
+    def estimate_duration(self, destination: tuple, mouseSpeed: str = "fast") -> float:
+        """
+        Estimates how long `move_to` will take to reach a destination. A movement's curve has a number of points set
+        by its speed, not by its distance (which only affects its shape), so the estimate is the expected number of
+        points for the speed times the measured time per point.
+        Args:
+            destination: x, y tuple of the destination point.
+            mouseSpeed: The speed that will be passed to `move_to`.
+        Returns:
+            The estimated duration in seconds, or 0 if the mouse is already at the destination.
+        """
+        start_x, start_y = pag.position()
+        if (start_x, start_y) == (destination[0], destination[1]):
+            return 0.0
+        if mouseSpeed not in MOUSE_SPEEDS:
+            raise ValueError("Invalid mouse speed. Try 'slowest', 'slow', 'medium', 'fast', or 'fastest'.")
+        low, high = MOUSE_SPEEDS[mouseSpeed]
+        return (low + high) / 2 * self.step_duration
 
     def move_rel(self, x: int, y: int, x_var: int = 0, y_var: int = 0, **kwargs):
         """
@@ -138,14 +168,12 @@ class Mouse:
         bottom_right_pos = Point(max(rect1.get_bottom_right().x, rect2.get_bottom_right().x), max(rect1.get_bottom_right().y, rect2.get_bottom_right().y))
         cursor_sct = Rectangle.from_points(top_left_pos, bottom_right_pos).screenshot()
 
-        for click_sprite in ["red_1.png", "red_3.png", "red_2.png", "red_4.png"]:
-            try:
-                if imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("mouse_clicks", click_sprite), cursor_sct):
-                    return True
-            except mss.ScreenShotError:
-                print("Failed to take screenshot of mouse cursor. Please report this error to the developer.")
-                continue
-        return False
+        click_sprites = [imsearch.BOT_IMAGES.joinpath("mouse_clicks", click_sprite) for click_sprite in ["red_1.png", "red_3.png", "red_2.png", "red_4.png"]]
+        try:
+            return any(imsearch.search_many(click_sprites, cursor_sct, first=True).values())
+        except mss.ScreenShotError:
+            print("Failed to take screenshot of mouse cursor. Please report this error to the developer.")
+            return False
 
     def __calculate_knots(self, destination: tuple):
         """
@@ -162,18 +190,9 @@ class Mouse:
         """
         Converts a text speed to a numeric speed for HumanCurve (targetPoints).
         """
-        if speed == "slowest":
-            min, max = 85, 100
-        elif speed == "slow":
-            min, max = 65, 80
-        elif speed == "medium":
-            min, max = 45, 60
-        elif speed == "fast":
-            min, max = 20, 40
-        elif speed == "fastest":
-            min, max = 10, 15
-        else:
+        if speed not in MOUSE_SPEEDS:
             raise ValueError("Invalid mouse speed. Try 'slowest', 'slow', 'medium', 'fast', or 'fastest'.")
+        min, max = MOUSE_SPEEDS[speed]
         return round(truncated_normal_sample(min, max))
 
 
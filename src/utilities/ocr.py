@@ -1,6 +1,10 @@
-import pathlib
+import functools
+import hashlib
+import operator
+import sys
+from itertools import groupby
 from operator import itemgetter
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
@@ -13,6 +17,11 @@ if __name__ == "__main__":
 
 import utilities.color as clr
 import utilities.debug as debug
+import utilities.font_atlas as font_atlas
+import utilities.glyph_ocr as glyph_ocr
+import utilities.stacked_ocr as stacked_ocr
+from utilities.cache import LRUCache
+from utilities.dirty_regions import region_cache, region_key
 from utilities.geometry import Rectangle
 
 problematic_chars = [
@@ -73,123 +82,343 @@ problematic_chars = [
 ]
 
 
-def __load_font(font: str) -> Dict[str, cv2.Mat]:
+# Fonts are loaded from the font atlas on first use (see `utilities.font_atlas`)
+__FONTS = {
+    "PLAIN_11": "Plain11",  # Used by RuneLite plugins, small interface text (orbs)
+    "PLAIN_12": "Plain12",  # Chatbox text, medium interface text
+    "BOLD_12": "Bold12",  # Main text, top-left mouseover text, overhead chat
+    "QUILL": "Quill",  # Large bold quest text
+    "QUILL_8": "Quill8",  # Small quest text
+}
+
+
+def __getattr__(name: str) -> Dict[str, cv2.Mat]:
     """
-    Loads a font's alphabet from the fonts directory into a dictionary.
-    Args:
-        font: The name of the font to load.
-    Returns:
-        A dictionary of {"char": image} pairs.
+    Loads a font the first time it is accessed as a module attribute (E.g., `ocr.PLAIN_12`).
     """
-    PATH = pathlib.Path(__file__).parent.joinpath("fonts", font)
-    pathlist = PATH.rglob("*.bmp")
-    alphabet = {}
-    for path in pathlist:
-        name = int(path.stem)
-        key = chr(name)
-        value = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
-        alphabet[key] = value
-    return alphabet
+    if name not in __FONTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    font = globals()[name] = font_atlas.load_font(__FONTS[name])
+    return font
+
 
+# OCR engines
+TEMPLATE = "template"  # Template matches every glyph of the font across the whole image
+GLYPH = "glyph"  # Segments the image into glyphs and looks them up in an index (see `utilities.glyph_ocr`)
+STACKED = "stacked"  # Correlates all glyphs of the font in one batched matrix multiply (see `utilities.stacked_ocr`)
+default_engine = TEMPLATE
 
-PLAIN_11 = __load_font("Plain11")  # Used by RuneLite plugins, small interface text (orbs)
-PLAIN_12 = __load_font("Plain12")  # Chatbox text, medium interface text
-BOLD_12 = __load_font("Bold12")  # Main text, top-left mouseover text, overhead chat
-QUILL = __load_font("Quill")  # Large bold quest text
-QUILL_8 = __load_font("Quill8")  # Small quest text
+# Remembers the characters found in recently read color-isolated images, keyed by a hash of the image, the font and
+# the search parameters. Opt-in: set `ocr.result_cache.enabled = True`. Use `ocr.result_cache.stats()` to tune it.
+result_cache = LRUCache(max_entries=512, max_bytes=2 * 1024 * 1024, enabled=False)
 
 
-def extract_text(rect: Rectangle, font: dict, color: Union[clr.Color, List[clr.Color]], exclude_chars: Union[str, List[str]] = problematic_chars) -> str:
+def extract_text(
+    rect: Union[Rectangle, cv2.Mat],
+    font: dict,
+    color: Union[clr.Color, List[clr.Color], clr.ColorSet],
+    exclude_chars: Union[str, List[str]] = problematic_chars,
+    engine: str = None,
+) -> str:
     """
     Extracts text from a Rectangle.
     Args:
-        rect: The rectangle to search within.
+        rect: The rectangle to search within (can be a Rectangle or a BGR matrix).
         font: The font type to search for.
         color: The color(s) of the text to search for.
         exclude_chars: A list of characters to exclude from the search. By default, this is a list of characters that
                        are known to cause problems.
+        engine: The OCR engine to use (TEMPLATE, GLYPH or STACKED). Defaults to `default_engine`.
     Returns:
         A single string containing all text found in order, no spaces.
+    Notes:
+        While the pixels in the Rectangle remain unchanged, the previous result is reused (see `utilities.dirty_regions`).
+        If `result_cache` is enabled, results for identical color-isolated images are reused, wherever they appear.
+    """
+    engine = engine or default_engine
+    if not isinstance(rect, Rectangle):
+        return __extract_text(rect, font, color, exclude_chars, engine)
+    image = rect.screenshot()
+    key = ("extract_text", region_key(rect), id(font), clr.colors_key(color), tuple(exclude_chars), engine)
+    return region_cache.cached(key, image, lambda: __extract_text(image, font, color, exclude_chars, engine))
+
+
+def __extract_text(
+    image: cv2.Mat, font: dict, color: Union[clr.Color, List[clr.Color], clr.ColorSet], exclude_chars: Union[str, List[str]], engine: str
+) -> str:
+    # Isolate colors
+    image = clr.isolate_colors(image, color)
+    chars = [key for key in font if key != " " and key not in exclude_chars]
+    char_list = __match_chars(image, font, chars, engine)
+    # Sort the char list based on which ones appear closest to the top-left of the image
+    char_list = sorted(char_list, key=itemgetter(2, 1))
+    # Join the charachers into a string
+    return "".join(letter for letter, _, _ in char_list)
+
+
+def __match_chars(image: cv2.Mat, font: dict, chars: List[str], engine: str) -> List[list]:
+    """
+    Locates each instance of the given characters in a color-isolated image, reusing a previous result for an
+    identical image if `result_cache` is enabled.
+    Returns:
+        A list of [char, x, y] entries, unsorted. Do not modify it, as it may be shared with future calls.
     """
-    # Screenshot and isolate colors
-    image = clr.isolate_colors(rect.screenshot(), color)
-    result = ""
+    if not result_cache.enabled:
+        return __locate_chars(image, font, chars, engine)
+    digest = hashlib.blake2b(np.ascontiguousarray(image), digest_size=16).digest()
+    key = (image.shape, digest, id(font), tuple(chars), engine)
+    return result_cache.cached(key, lambda: __locate_chars(image, font, chars, engine), size=__sizeof_chars)
+
+
+def __sizeof_chars(char_list: List[list]) -> int:
+    return sys.getsizeof(char_list) + sum(sys.getsizeof(entry) + 3 * 32 for entry in char_list)
+
+
+def __locate_chars(image: cv2.Mat, font: dict, chars: List[str], engine: str) -> List[list]:
+    crop = 2 if font is globals().get("PLAIN_12") else 1  # A font that hasn't been loaded can't be in use
+    if engine == GLYPH:
+        return glyph_ocr.match_chars(image, font, chars, crop, fallback=lambda sub_image, sub_chars: __template_match_chars(sub_image, font, sub_chars, crop))
+    if engine == TEMPLATE:
+        return __template_match_chars(image, font, chars, crop)
+    if engine == STACKED:
+        return stacked_ocr.match_chars(image, font, chars, crop)
+    raise ValueError(f"Unknown OCR engine: {engine}.")
+
+
+def __template_match_chars(image: cv2.Mat, font: dict, chars: List[str], crop: int) -> List[list]:
     char_list = []
-    for key in font:
-        if key == " " or key in exclude_chars:
+    for char in chars:
+        template = font[char][crop:]
+        if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
             continue
         # Template match the character in the image
-        if font is PLAIN_12:
-            correlation = cv2.matchTemplate(image, font[key][2:], cv2.TM_CCOEFF_NORMED)
-        else:
-            correlation = cv2.matchTemplate(image, font[key][1:], cv2.TM_CCOEFF_NORMED)
+        correlation = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
         # Locate the start point for each instance of this character
-        y_mins, x_mins = np.where(correlation >= 0.98)
+        y_mins, x_mins = np.where(correlation >= glyph_ocr.THRESHOLD)
         # For each instance of this character, add it to the list
-        char_list.extend([key, x, y] for x, y in zip(x_mins, y_mins))
-    # Sort the char list based on which ones appear closest to the top-left of the image
-    char_list = sorted(char_list, key=itemgetter(2, 1))
-    # Join the charachers into a string
-    return result.join(letter for letter, _, _ in char_list)
+        char_list.extend([char, x, y] for x, y in zip(x_mins, y_mins))
+    return char_list
 
 
 def find_text(
     text: Union[str, List[str]],
-    rect: Rectangle,
+    rect: Union[Rectangle, cv2.Mat],
     font: dict,
-    color: Union[clr.Color, List[clr.Color]],
+    color: Union[clr.Color, List[clr.Color], clr.ColorSet],
+    engine: str = None,
 ) -> List[Rectangle]:
     """
     Searches for exact text within a Rectangle. Input text is case sensitive.
     Args:
         text: The text to search for. Can be a phrase or a single word. You may also pass a list of strings to search for,
-              but you cannot distinguish between them in the function output.
-        rect: The rectangle to search within.
+              but you cannot distinguish between them in the function output (see `find_phrases`).
+        rect: The rectangle to search within (can be a Rectangle or a BGR matrix). If a matrix is supplied, the
+              returned Rectangles are relative to its top-left corner.
         font: The font type to search for.
         color: The color(s) of the text to search for.
+        engine: The OCR engine to use (TEMPLATE, GLYPH or STACKED). Defaults to `default_engine`.
     Returns:
         A list of Rectangles containing the coordinates of the text found.
+    Notes:
+        While the pixels in the Rectangle remain unchanged, the previous result is reused (see `utilities.dirty_regions`).
+        If `result_cache` is enabled, results for identical color-isolated images are reused, wherever they appear.
     """
-    # Screenshot and isolate colors
-    image = clr.isolate_colors(rect.screenshot(), color)
+    phrases = [text] if isinstance(text, str) else list(text)
+    found = find_phrases(phrases, rect, font, color, engine)
+    return [rect for phrase in phrases for rect in found[phrase]]
+
+
+def find_phrases(
+    phrases: List[str],
+    rect: Union[Rectangle, cv2.Mat],
+    font: dict,
+    color: Union[clr.Color, List[clr.Color], clr.ColorSet],
+    engine: str = None,
+) -> Dict[str, List[Rectangle]]:
+    """
+    Searches for several phrases within a Rectangle at once. The region is read once for the characters of all
+    phrases, and each phrase is then located among its own characters, so the result for each phrase is the same as
+    searching for it alone. Input text is case sensitive.
+    Args:
+        phrases: The phrases to search for.
+        rect: The rectangle to search within (can be a Rectangle or a BGR matrix). If a matrix is supplied, the
+              returned Rectangles are relative to its top-left corner.
+        font: The font type to search for.
+        color: The color(s) of the text to search for.
+        engine: The OCR engine to use (TEMPLATE, GLYPH or STACKED). Defaults to `default_engine`.
+    Returns:
+        A dictionary of {phrase: [Rectangle, ...]} pairs, with an entry (possibly empty) for every phrase.
+    Example:
+        >>> found = find_phrases(["Chop", "Walk here"], self.win.mouseover, ocr.BOLD_12, clr.OFF_WHITE)
+        >>> if found["Chop"]:
+        ...     self.mouse.click()
+    Notes:
+        While the pixels in the Rectangle remain unchanged, the previous result is reused (see `utilities.dirty_regions`).
+        If `result_cache` is enabled, results for identical color-isolated images are reused, wherever they appear.
+    """
+    engine = engine or default_engine
+    phrases = tuple(dict.fromkeys(phrases))  # Remove duplicates, preserving order
+    if not isinstance(rect, Rectangle):
+        return __find_phrases(phrases, rect, Rectangle(0, 0, rect.shape[1], rect.shape[0]), font, color, engine)
+    image = rect.screenshot()
+    key = ("find_phrases", region_key(rect), id(font), clr.colors_key(color), phrases, engine)
+    found = region_cache.cached(key, image, lambda: __find_phrases(phrases, image, rect, font, color, engine))
+    return {phrase: list(rects) for phrase, rects in found.items()}
+
+
+def __find_phrases(
+    phrases: Tuple[str, ...],
+    image: cv2.Mat,
+    rect: Rectangle,
+    font: dict,
+    color: Union[clr.Color, List[clr.Color], clr.ColorSet],
+    engine: str,
+) -> Dict[str, List[Rectangle]]:
+    # Isolate colors
+    image = clr.isolate_colors(image, color)
 
     # Extract unique characters from input text
-    chars = "".join(set("".join(text))).replace(" ", "")
-    char_list = []
+    chars = "".join(set("".join(phrases))).replace(" ", "")
     for char in chars:
-        try:
-            template = font[char][2:] if font is PLAIN_12 else font[char][1:]
-        except KeyError:
-            text = text.replace(char, "")  # Remove characters that aren't in the font
+        if char not in font:
             print(f"Font does not contain character: {char}. Omitting from search.")
-            continue
-        correlation = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
-        y_mins, x_mins = np.where(correlation >= 0.98)
-        char_list.extend([char, x, y] for x, y in zip(x_mins, y_mins))
+    chars = [char for char in chars if char in font]
+    char_list = __match_chars(image, font, chars, engine)
 
     # Sort the char list based on which ones appear closest to the top-left of the image
     char_list = sorted(char_list, key=itemgetter(2, 1))
 
-    haystack = "".join(char[0] for char in char_list)
-
-    words_found: List[Rectangle] = []
-
-    if isinstance(text, str):
-        text = [text]
-
-    for word in text:
-        word = word.replace(" ", "")
-        for index, _ in enumerate(haystack):
-            if haystack[index : index + len(word)] == word:
+    found: Dict[str, List[Rectangle]] = {phrase: [] for phrase in phrases}
+    for phrase in phrases:
+        # Remove spaces and characters that aren't in the font
+        word = "".join(char for char in phrase if char in font and char != " ")
+        if not word:
+            continue
+        # Only consider this phrase's characters, as if it were searched for alone. Characters found at the same
+        # position (E.g., "I" and "l", which share a glyph in some fonts) are alternatives, and either may match.
+        positions = [
+            (x, y, {entry[0] for entry in group}) for (x, y), group in groupby((entry for entry in char_list if entry[0] in word), key=itemgetter(1, 2))
+        ]
+        for start in range(len(positions) - len(word) + 1):
+            if all(char in positions[start + i][2] for i, char in enumerate(word)):
                 # get the position of the first letter
-                left, top = char_list[index][1], char_list[index][2]
+                left, top = positions[start][0], positions[start][1]
                 # get shape of last letter
                 h, w = font[word[-1]].shape[:2]
                 # get the width (height is the same for all letters)
-                width = char_list[index + len(word) - 1][1] - left + w
-                words_found.append(Rectangle(left + rect.left, top + rect.top, width, h))
-                index += len(word)
-    return words_found
+                width = positions[start + len(word) - 1][0] - left + w
+                found[phrase].append(Rectangle(left + rect.left, top + rect.top, width, h))
+    return found
+
+
+def read_int(
+    rect: Union[Rectangle, cv2.Mat],
+    font: Union[dict, List[dict]],
+    color: Union[clr.Color, List[clr.Color], clr.ColorSet],
+) -> Optional[int]:
+    """
+    Reads a whole number from a single line of text, ignoring any characters other than digits (E.g., commas). This
+    only compares the 10 digit glyphs of a font, and is much faster than `extract_text`.
+    Args:
+        rect: The rectangle to read (can be a Rectangle or a BGR matrix).
+        font: The font of the number, or a list of fonts it may be in.
+        color: The color(s) of the text.
+    Returns:
+        The number, or None if no digits were found.
+    """
+    image = rect.screenshot() if isinstance(rect, Rectangle) else rect
+    digits = __read_digits(clr.isolate_colors(image, color), font)
+    return int(digits) if digits else None
+
+
+def read_ints(
+    rects: Dict[str, Rectangle],
+    area: Rectangle,
+    font: Union[dict, List[dict]],
+    color: Union[clr.Color, List[clr.Color], clr.ColorSet],
+) -> Dict[str, Optional[int]]:
+    """
+    Reads several numbers from one screenshot of a larger area (see `read_int`).
+    Args:
+        rects: A dictionary of {name: Rectangle} pairs to read. Each Rectangle must lie within `area`.
+        area: The area to screenshot. Exclusion masks are not applied.
+        font: The font of the numbers, or a list of fonts they may be in.
+        color: The color(s) of the text.
+    Returns:
+        A dictionary of {name: number} pairs. A number is None if no digits were found.
+    Example:
+        >>> ocr.read_ints({"hp": self.win.hp_orb_text, "prayer": self.win.prayer_orb_text}, self.win.minimap_area,
+        ...               ocr.PLAIN_11, clr.ORB_COLORS)
+    """
+    image = area.screenshot(apply_mask=False)
+    numbers = {}
+    for name, rect in rects.items():
+        left, top = rect.left - area.left, rect.top - area.top
+        if left < 0 or top < 0 or left + rect.width > area.width or top + rect.height > area.height:
+            raise ValueError(f"Rectangle {name} is not within the area.")
+        numbers[name] = read_int(image[top : top + rect.height, left : left + rect.width], font, color)
+    return numbers
+
+
+__digit_tables: Dict[Tuple[int, ...], Tuple[tuple, Dict[Tuple[int, ...], str], List[int]]] = {}
+
+
+def __digit_table(fonts: Tuple[dict, ...]) -> Tuple[Dict[Tuple[int, ...], str], List[int]]:
+    """
+    Returns a table of {column signature: digit} for the digits of the given fonts, and the signature widths from
+    widest to narrowest. A column signature is the bitmask of each column of a glyph's ink, shifted so that the top
+    row of ink is bit 0.
+    """
+    key = tuple(id(font) for font in fonts)
+    if (cached := __digit_tables.get(key)) is None:
+        table = {}
+        for font in fonts:
+            for digit in "0123456789":
+                cols = np.flatnonzero((font[digit] > 0).any(axis=0))
+                masks = __column_masks(font[digit][:, cols[0] : cols[-1] + 1] > 0)
+                table.setdefault(__signature(masks), digit)
+        cached = __digit_tables[key] = (fonts, table, sorted({len(signature) for signature in table}, reverse=True))
+    return cached[1], cached[2]
+
+
+def __column_masks(ink: np.ndarray) -> List[int]:
+    """
+    Returns the bitmask of each column of a boolean image, where bit `i` is set if row `i` contains ink.
+    """
+    if ink.shape[0] < 64:
+        weights = np.left_shift(np.uint64(1), np.arange(ink.shape[0], dtype=np.uint64))
+    else:
+        weights = np.array([1 << row for row in range(ink.shape[0])], dtype=object)
+    return (ink * weights[:, None]).sum(axis=0).tolist()
+
+
+def __signature(masks: List[int]) -> Tuple[int, ...]:
+    union = functools.reduce(operator.or_, masks, 0)
+    shift = (union & -union).bit_length() - 1
+    return tuple(mask >> shift for mask in masks)
+
+
+def __read_digits(image: cv2.Mat, font: Union[dict, List[dict]]) -> str:
+    """
+    Reads the digits in a color-isolated image from left to right.
+    """
+    table, widths = __digit_table(tuple(font) if isinstance(font, list) else (font,))
+    masks = __column_masks(image.reshape(image.shape[0], image.shape[1]) > 0)
+    digits = ""
+    i = 0
+    while i < len(masks):
+        if masks[i]:
+            # Digits may touch their neighbours, so try to match the widest digit starting at this column first
+            for width in widths:
+                if i + width <= len(masks) and masks[i + width - 1] and (digit := table.get(__signature(masks[i : i + width]))):
+                    digits += digit
+                    i += width
+                    break
+            else:
+                i += 1
+        else:
+            i += 1
+    return digits
 
 
 if __name__ == "__main__":
@@ -204,7 +433,7 @@ if __name__ == "__main__":
     # PARAMETERS
     # ----------------
     area = win.chat
-    font = PLAIN_12
+    font = __getattr__("PLAIN_12")
     color = [clr.BLACK]
     text = ["Welcome", "Old", "RuneScape"]  # find_text only
 
@@ -0,0 +1,289 @@
+"""
+Records client frames to disk so that real sessions can be replayed later for profiling and regression testing
+(see `capture.ReplayCapture`).
+
+A recording is a directory containing:
+    frames.bin  - Concatenated zlib-compressed frames. Every `keyframe_interval` frames (and whenever the frame size
+                  changes) a full frame is stored; all other frames are stored as the XOR of the frame with the one
+                  before it, which is mostly zeros and compresses very well.
+    index.bin   - A fixed-size record per frame (see `INDEX_DTYPE`) with the offset/length of its data in frames.bin,
+                  its timestamp, and the id of the window layout at the time. Readable with `np.memmap`.
+    layouts.json - The distinct `Window.layout()` dicts seen during the session, referenced by id from the index.
+    meta.json   - The recorded screen area and recording settings.
+
+Example:
+    >>> recorder = SessionRecorder("recordings/session_1", self.win, fps=15)
+    >>> recorder.start()
+    >>> ...  # Run the bot as usual
+    >>> recorder.stop()
+"""
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from utilities import capture
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        ("timestamp", "<f8"),
+        ("height", "<u2"),
+        ("width", "<u2"),
+        ("keyframe", "u1"),
+        ("layout", "<u2"),
+    ]
+)
+
+
+class SessionRecorder:
+    def __init__(
+        self,
+        path: Union[str, Path],
+        window=None,
+        fps: float = 15,
+        keyframe_interval: int = 30,
+        max_queue: int = 32,
+        monitor: dict = None,
+        service: capture.CaptureService = None,
+        compression: int = 1,
+    ):
+        """
+        Streams captured frames to a recording directory. Capturing and writing each happen on their own thread,
+        connected by a bounded queue. If the writer falls behind, new frames are dropped (and counted) rather than
+        stalling the capture thread or the bot.
+        Args:
+            path: The directory to write the recording to. It will be created if it does not exist.
+            window: The bot's Window. Its rectangle is recorded, and its layout is stored alongside each frame.
+            fps: The target number of frames per second to record.
+            keyframe_interval: The number of frames between full (non-delta) frames. Lower values make seeking
+                               faster at the cost of disk space.
+            max_queue: The maximum number of frames waiting to be written.
+            monitor: The screen area to record {left, top, width, height}. Defaults to the window's rectangle.
+            service: An optional running CaptureService to take frames from instead of capturing separately.
+            compression: The zlib compression level (1-9). Higher levels are smaller but slower.
+        """
+        if window is None and monitor is None and service is None:
+            raise ValueError("A window, monitor or capture service must be provided.")
+        self.path = Path(path)
+        self.window = window
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval
+        self.compression = compression
+        self.service = service
+        if monitor is None:
+            monitor = service.monitor if service is not None else window.rectangle().to_dict()
+        self.monitor = dict(monitor)
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._layouts = []
+        self._layout_ids = {}
+        self._layout_lock = threading.Lock()
+        self._running = False
+        self._capture_thread: threading.Thread = None
+        self._writer_thread: threading.Thread = None
+
+    def start(self) -> None:
+        """
+        Starts recording.
+        """
+        if self._running:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta = {"monitor": self.monitor, "fps": self.fps, "keyframe_interval": self.keyframe_interval}
+        self.path.joinpath("meta.json").write_text(json.dumps(meta, indent=2))
+        self._running = True
+        self._writer_thread = threading.Thread(target=self.__write_frames, daemon=True)
+        self._capture_thread = threading.Thread(target=self.__capture_frames, daemon=True)
+        self._writer_thread.start()
+        self._capture_thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops recording and waits for all queued frames to be written.
+        """
+        if not self._running:
+            return
+        self._running = False
+        self._capture_thread.join()
+        self._queue.put(None)  # Tell the writer to finish
+        self._writer_thread.join()
+        print(f"SessionRecorder: Wrote {self.frames_written} frames to {self.path} ({self.frames_dropped} dropped).")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def record(self, image: np.ndarray, timestamp: float = None) -> bool:
+        """
+        Queues a frame to be written. Use this to record frames captured elsewhere.
+        Args:
+            image: A BGR image of the recorded area.
+            timestamp: A `time.monotonic()` timestamp. Defaults to now.
+        Returns:
+            True if the frame was queued, False if it was dropped because the writer is behind.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        try:
+            self._queue.put_nowait((timestamp, image, self.__layout_id()))
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    def __layout_id(self) -> int:
+        """
+        Returns the id of the window's current layout, registering it if it hasn't been seen before.
+        """
+        if self.window is None:
+            return 0
+        layout = self.window.layout()
+        key = json.dumps(layout, sort_keys=True)
+        with self._layout_lock:
+            if key not in self._layout_ids:
+                self._layouts.append(layout)
+                self.__write_layouts()
+                self._layout_ids[key] = len(self._layouts) - 1
+            return self._layout_ids[key]
+
+    def __write_layouts(self):
+        """
+        Writes layouts.json. This is done as soon as a layout is registered, before any frame refers to it, so the
+        recording stays readable if the session ends abruptly. The file is replaced atomically.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.joinpath("layouts.json.tmp")
+        tmp.write_text(json.dumps(self._layouts))
+        os.replace(tmp, self.path.joinpath("layouts.json"))
+
+    def __capture_frames(self):
+        interval = 1 / self.fps
+        last_timestamp = -np.inf
+        next_capture = time.monotonic()
+        while self._running:
+            if self.service is not None:
+                frame = self.service.wait_for_newer(last_timestamp, timeout=interval)
+                if frame is None:
+                    continue
+                timestamp, image = frame
+            else:
+                try:
+                    image = capture.grab(self.monitor)
+                except Exception as e:
+                    print(f"SessionRecorder: Failed to capture frame: {e}")
+                    time.sleep(interval)
+                    continue
+                timestamp = time.monotonic()
+            self.record(image, timestamp)
+            last_timestamp = timestamp
+            next_capture += interval
+            delay = next_capture - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_capture = time.monotonic()
+
+    def __write_frames(self):
+        previous: np.ndarray = None
+        offset = 0
+        with self.path.joinpath("frames.bin").open("wb") as frames, self.path.joinpath("index.bin").open("wb") as index:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                timestamp, image, layout_id = item
+                image = np.ascontiguousarray(image)
+                h, w = image.shape[:2]
+                keyframe = previous is None or previous.shape != image.shape or self.frames_written % self.keyframe_interval == 0
+                data = image if keyframe else np.bitwise_xor(image, previous)
+                payload = zlib.compress(data.tobytes(), self.compression)
+                frames.write(payload)
+                record = np.array([(offset, len(payload), timestamp, h, w, keyframe, layout_id)], dtype=INDEX_DTYPE)
+                index.write(record.tobytes())
+                offset += len(payload)
+                previous = image
+                self.frames_written += 1
+
+
+class SessionReader:
+    def __init__(self, path: Union[str, Path]):
+        """
+        Reads a recording made by SessionRecorder. Frames can be accessed in any order, although sequential access
+        is fastest since each delta frame only needs to be applied to the previously decoded frame.
+        Args:
+            path: The recording directory.
+        """
+        self.path = Path(path)
+        self.meta = json.loads(self.path.joinpath("meta.json").read_text())
+        self.index = np.fromfile(str(self.path.joinpath("index.bin")), dtype=INDEX_DTYPE)
+        layouts = self.path.joinpath("layouts.json")
+        self.layouts = json.loads(layouts.read_text()) if layouts.exists() else []
+        self.timestamps = self.index["timestamp"]
+        self._data = np.memmap(str(self.path.joinpath("frames.bin")), dtype=np.uint8, mode="r") if len(self.index) else None
+        self._cached_index = -1
+        self._cached_frame: np.ndarray = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.frame(i)
+
+    def __decode(self, i: int) -> np.ndarray:
+        record = self.index[i]
+        start = int(record["offset"])
+        payload = self._data[start : start + int(record["length"])]
+        return np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(int(record["height"]), int(record["width"]), 3)
+
+    def frame(self, i: int) -> np.ndarray:
+        """
+        Decodes a frame.
+        Args:
+            i: The index of the frame.
+        Returns:
+            The BGR image. Do not modify it, as it may be reused to decode the next frame.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Frame index {i} out of range.")
+        with self._lock:
+            # Start from the previously decoded frame if possible, otherwise from the nearest keyframe
+            if self._cached_index < 0 or not self._cached_index <= i or np.any(self.index["keyframe"][self._cached_index + 1 : i + 1]):
+                start = i
+                while not self.index[start]["keyframe"]:
+                    start -= 1
+                frame = self.__decode(start)
+            else:
+                start, frame = self._cached_index, self._cached_frame
+            for j in range(start + 1, i + 1):
+                frame = np.bitwise_xor(frame, self.__decode(j))
+            self._cached_index, self._cached_frame = i, frame
+            return frame
+
+    def layout(self, i: int) -> Optional[dict]:
+        """
+        Returns the window layout (see `Window.layout()`) at the time frame `i` was recorded, if one was stored.
+        """
+        layout_id = int(self.index[i]["layout"])
+        return self.layouts[layout_id] if layout_id < len(self.layouts) else None
+
+    def iter_frames(self):
+        """
+        Yields (timestamp, image) tuples for every frame in order.
+        """
+        for i in range(len(self)):
+            yield float(self.timestamps[i]), self.frame(i)
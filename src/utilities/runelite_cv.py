@@ -10,18 +10,32 @@ from typing import List
 import cv2
 import numpy as np
 
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path[0] = os.path.dirname(sys.path[0])
+
 from utilities.geometry import Point, RuneLiteObject
 
+# The margin kept around each object when filling and eroding it, in pixels. It must exceed the distance the 7x7
+# opening and erosions can reach (3 pixels per pass).
+OBJECT_MARGIN = 12
 
-def extract_objects(image: cv2.Mat) -> List[RuneLiteObject]:
+
+def extract_objects(image: cv2.Mat, mask: cv2.Mat = None) -> List[RuneLiteObject]:
     """
     Given an image of enclosed outlines, this function will extract information
     from each outlined object into a data structure.
     Args:
         image: The image to process.
+        mask: Optionally, a single-channel mask the size of the image (E.g., `Rectangle.mask`). Outlines in areas
+              where the mask is 0 are ignored.
     Returns:
         A list of RuneLiteObjects, or an empty list if no objects are found.
     """
+    if mask is not None:
+        image = cv2.bitwise_and(image, mask)
     # Dilate the outlines
     kernel = np.ones((4, 4), np.uint8)
     mask = cv2.dilate(image, kernel, iterations=1)
@@ -30,27 +44,30 @@ def extract_objects(image: cv2.Mat) -> List[RuneLiteObject]:
         return []
     # Find the contours
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    black_image = np.zeros(mask.shape, dtype="uint8")
+    frame_h, frame_w = mask.shape[:2]
+    kernel = np.ones((7, 7), np.uint8)
     # Extract the objects from each contoured object
     objs: List[RuneLiteObject] = []
-    for objects in range(len(contours)):
-        if len(contours[objects]) > 2:
-            # Fill in the outline with white pixels
-            black_copy = black_image.copy()
-            cv2.drawContours(black_copy, contours, objects, (255, 255, 255), -1)
-            kernel = np.ones((7, 7), np.uint8)
-            black_copy = cv2.morphologyEx(black_copy, cv2.MORPH_OPEN, kernel)
-            black_copy = cv2.erode(black_copy, kernel, iterations=2)
-            if np.count_nonzero(black_copy == 255):
-                indices = np.where(black_copy == [255])
-                if indices[0].size > 0:
-                    x_min, x_max = np.min(indices[1]), np.max(indices[1])
-                    y_min, y_max = np.min(indices[0]), np.max(indices[0])
-                    width, height = x_max - x_min, y_max - y_min
-                    center = [int(x_min + (width / 2)), int(y_min + (height / 2))]
-                    axis = np.column_stack((indices[1], indices[0]))
-                    objs.append(RuneLiteObject(x_min, x_max, y_min, y_max, width, height, center, axis))
-    return objs or []
+    for contour in contours:
+        if len(contour) > 2:
+            # Fill in the outline with white pixels, working only on the area around the object. The margin is wider
+            # than the morphology below can reach, so the result is the same as processing the whole frame.
+            x, y, w, h = cv2.boundingRect(contour)
+            left, top = max(x - OBJECT_MARGIN, 0), max(y - OBJECT_MARGIN, 0)
+            right, bottom = min(x + w + OBJECT_MARGIN, frame_w), min(y + h + OBJECT_MARGIN, frame_h)
+            filled = np.zeros((bottom - top, right - left), dtype="uint8")
+            cv2.drawContours(filled, [contour], 0, (255, 255, 255), -1, offset=(-left, -top))
+            filled = cv2.morphologyEx(filled, cv2.MORPH_OPEN, kernel)
+            filled = cv2.erode(filled, kernel, iterations=2)
+            x, y, w, h = cv2.boundingRect(filled)
+            if w > 0:
+                object_mask = filled[y : y + h, x : x + w] == 255
+                x_min, x_max = x + left, x + left + w - 1
+                y_min, y_max = y + top, y + top + h - 1
+                width, height = x_max - x_min, y_max - y_min
+                center = [int(x_min + (width / 2)), int(y_min + (height / 2))]
+                objs.append(RuneLiteObject(x_min, x_max, y_min, y_max, width, height, center, mask=object_mask))
+    return objs
 
 
 def is_point_obstructed(point: Point, im: cv2.Mat, span: int = 30) -> bool:
@@ -72,3 +89,25 @@ def is_point_obstructed(point: Point, im: cv2.Mat, span: int = 30) -> bool:
     except Exception as e:
         print(f"Error in is_point_obstructed(): {e}")
         return True
+
+
+if __name__ == "__main__":
+    """
+    Run this file directly to time `extract_objects` on game-view sized frames with 1, 10 and 50 tagged outlines.
+    No game client is required.
+    """
+    import time
+
+    rng = np.random.default_rng(0)
+    for count in (1, 10, 50):
+        frame = np.zeros((800, 1400), dtype=np.uint8)
+        for _ in range(count):
+            center = (int(rng.integers(0, frame.shape[1])), int(rng.integers(0, frame.shape[0])))
+            axes = (int(rng.integers(8, 60)), int(rng.integers(8, 80)))
+            cv2.ellipse(frame, center, axes, int(rng.integers(0, 180)), 0, 360, 255, 1)
+        extract_objects(frame)  # Warm up
+        runs = 10
+        start = time.perf_counter()
+        for _ in range(runs):
+            objs = extract_objects(frame)
+        print(f"{count} outlines ({len(objs)} objects): {(time.perf_counter() - start) / runs * 1000:.1f} ms")
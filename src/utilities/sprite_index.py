@@ -0,0 +1,292 @@
+"""
+Identifies item sprites (E.g., in inventory or bank slots) from an index of the sprites downloaded by
+`utilities.sprite_scraper`.
+
+Each sprite is reduced to a compact feature vector: its item pixels are cropped to their bounding box and shrunk to a
+GRID x GRID color thumbnail, followed by the bounding box's size. The top STACK_ROWS rows of a slot are ignored, as
+that is where stack numbers are drawn. A screenshot of a slot is reduced the same way, with pixels that match the
+slot's background treated as transparent. Identification is a dictionary lookup of the quantized vector, falling
+back to the nearest vector (by Euclidean distance) for screenshots that don't quantize identically (E.g., leftover
+stack number pixels).
+
+The index is saved next to the sprites and rebuilt automatically when it is loaded if the sprite files have changed.
+
+Example:
+    >>> slot = self.win.inventory_slots[0].screenshot()
+    >>> sprite_index.identify(slot)
+    'Shark'
+"""
+import hashlib
+import pathlib
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+import utilities.imagesearch as imsearch
+
+# The folders indexed by default, and where their index is saved
+SPRITE_FOLDERS = [imsearch.BOT_IMAGES.joinpath("scraper"), imsearch.BOT_IMAGES.joinpath("items")]
+INDEX_PATH = imsearch.BOT_IMAGES.joinpath("sprite_index.npz")
+
+# The size of an inventory or bank slot
+SLOT_HEIGHT, SLOT_WIDTH = 32, 36
+# The rows at the top of a slot where stack numbers are drawn
+STACK_ROWS = 9
+# The size of the color thumbnail of each sprite
+GRID = 8
+# The maximum difference from a slot's background color for a pixel to count as background
+BACKGROUND_TOLERANCE = 12
+# The number of low bits dropped from each feature for the exact lookup
+QUANTIZE_BITS = 4
+# The maximum root-mean-square difference per feature for the nearest sprite to be accepted
+MAX_DISTANCE = 24.0
+
+FEATURES = GRID * GRID * 3 + 2
+
+
+def __features(images: np.ndarray, masks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces the masked pixels of a batch of slot-sized BGR images to feature vectors.
+    Returns:
+        The feature vectors, and an array that is False for images with no masked pixels (whose vectors are zero).
+    """
+    masks = masks.copy()
+    masks[:, :STACK_ROWS] = False
+    rows, cols = masks.any(axis=2), masks.any(axis=1)
+    present = rows.any(axis=1)
+    tops, bottoms = rows.argmax(axis=1), SLOT_HEIGHT - rows[:, ::-1].argmax(axis=1)
+    lefts, rights = cols.argmax(axis=1), SLOT_WIDTH - cols[:, ::-1].argmax(axis=1)
+    items = np.where(masks[..., None], images, 0).astype(np.uint8)
+    vectors = np.zeros((len(images), FEATURES), dtype=np.uint8)
+    for i in np.nonzero(present)[0]:
+        item = items[i, tops[i] : bottoms[i], lefts[i] : rights[i]]
+        vectors[i, :-2] = cv2.resize(item, (GRID, GRID), interpolation=cv2.INTER_AREA).ravel()
+    vectors[:, -2] = np.where(present, bottoms - tops, 0)
+    vectors[:, -1] = np.where(present, rights - lefts, 0)
+    return vectors, present
+
+
+def sprite_features(sprite: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Returns the feature vector of a sprite as drawn in a slot, or None if it is larger than a slot or blank.
+    Args:
+        sprite: A BGRA sprite, or a BGR sprite on a black background (E.g., a `_bank` sprite).
+    """
+    height, width = sprite.shape[:2]
+    if height > SLOT_HEIGHT or width > SLOT_WIDTH:
+        return None
+    if sprite.ndim == 3 and sprite.shape[2] == 4:
+        mask = sprite[:, :, 3] > 0
+        sprite = sprite[:, :, :3]
+    else:
+        if sprite.ndim == 2:
+            sprite = cv2.cvtColor(sprite, cv2.COLOR_GRAY2BGR)
+        mask = sprite.any(axis=2)
+    # Center the sprite in a slot, as the game does
+    top, left = (SLOT_HEIGHT - height) // 2, (SLOT_WIDTH - width) // 2
+    image = np.zeros((SLOT_HEIGHT, SLOT_WIDTH, 3), dtype=np.uint8)
+    slot_mask = np.zeros((SLOT_HEIGHT, SLOT_WIDTH), dtype=bool)
+    image[top : top + height, left : left + width] = sprite
+    slot_mask[top : top + height, left : left + width] = mask
+    vectors, present = __features(image[None], slot_mask[None])
+    return vectors[0] if present[0] else None
+
+
+def slot_features(slot: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Returns the feature vector of a screenshot of a slot, or None if the slot is empty.
+    Args:
+        slot: A BGR screenshot of a slot (E.g., of `Window.inventory_slots[i]`).
+    """
+    vectors, present = slot_features_many(slot[None])
+    return vectors[0] if present[0] else None
+
+
+def slot_features_many(slots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the feature vectors of a batch of slot screenshots.
+    Args:
+        slots: BGR screenshots of slots, with shape (slots, SLOT_HEIGHT, SLOT_WIDTH, 3).
+    Returns:
+        An array of feature vectors with shape (slots, FEATURES), and an array that is False for empty slots (whose
+        vectors are zero).
+    """
+    slots = slots[..., :3]
+    # The background is the median color around the edge of each slot, which items rarely cover
+    edges = np.concatenate([slots[:, 0], slots[:, -1], slots[:, :, 0], slots[:, :, -1]], axis=1)
+    backgrounds = np.median(edges, axis=1).astype(np.int16)
+    masks = (np.abs(slots.astype(np.int16) - backgrounds[:, None, None]) > BACKGROUND_TOLERANCE).any(axis=3)
+    return __features(slots, masks)
+
+
+def fingerprint(folders: Sequence[Union[str, pathlib.Path]]) -> str:
+    """
+    Returns a hash of the names, sizes and modification times of the sprites in the given folders.
+    """
+    digest = hashlib.md5()
+    for folder in map(pathlib.Path, folders):
+        for path in sorted(folder.rglob("*.png")):
+            stat = path.stat()
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+class SpriteIndex:
+    def __init__(self, names: List[str], vectors: np.ndarray, fingerprint: str = ""):
+        """
+        Args:
+            names: The item name of each sprite.
+            vectors: The feature vector of each sprite, with shape (sprites, FEATURES).
+            fingerprint: The fingerprint of the sprites the index was built from (see `fingerprint`).
+        """
+        self.names = names
+        self.fingerprint = fingerprint
+        self.vectors = vectors.astype(np.uint8)
+        self._floats = self.vectors.astype(np.float32)
+        self._squares = (self._floats**2).sum(axis=1)
+        self._lookup: Dict[bytes, int] = {}
+        for i, vector in enumerate(self.vectors):
+            self._lookup.setdefault(self.__key(vector), i)
+
+    @staticmethod
+    def __key(vector: np.ndarray) -> bytes:
+        return (vector >> QUANTIZE_BITS).tobytes()
+
+    @classmethod
+    def build(cls, folders: Sequence[Union[str, pathlib.Path]] = SPRITE_FOLDERS) -> "SpriteIndex":
+        """
+        Indexes every sprite in the given folders (searched recursively). Sprites named `<item>_bank.png` are indexed
+        under `<item>`.
+        """
+        names, vectors = [], []
+        for folder in map(pathlib.Path, folders):
+            for path in sorted(folder.rglob("*.png")):
+                sprite = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+                if sprite is None or (vector := sprite_features(sprite)) is None:
+                    continue
+                names.append(path.stem[: -len("_bank")] if path.stem.endswith("_bank") else path.stem)
+                vectors.append(vector)
+        return cls(names, np.array(vectors, dtype=np.uint8).reshape(-1, FEATURES), fingerprint(folders))
+
+    def save(self, path: Union[str, pathlib.Path]) -> None:
+        """
+        Saves the index, along with the fingerprint of the sprites it was built from.
+        """
+        path = pathlib.Path(path)
+        # Write to a temporary file first so a partially written index is never read
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, names=np.array(self.names, dtype=str), vectors=self.vectors, fingerprint=np.array(self.fingerprint))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Union[str, pathlib.Path], fingerprint: str = None) -> Optional["SpriteIndex"]:
+        """
+        Loads a saved index.
+        Returns:
+            The index, or None if it doesn't exist or doesn't match the given fingerprint.
+        """
+        try:
+            with np.load(str(path)) as data:
+                if fingerprint is not None and str(data["fingerprint"]) != fingerprint:
+                    return None
+                return cls(data["names"].tolist(), data["vectors"].reshape(-1, FEATURES), str(data["fingerprint"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def match(self, vector: Optional[np.ndarray]) -> int:
+        """
+        Returns the position of the sprite matching a feature vector in `names`, or -1 if there is none.
+        """
+        if vector is None:
+            return -1
+        return int(self.match_many(vector[None])[0])
+
+    def match_many(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Returns the position in `names` of the sprite matching each of a batch of feature vectors, or -1 where there
+        is none.
+        """
+        matches = np.full(len(vectors), -1, dtype=np.int32)
+        if not self.names:
+            return matches
+        misses = []
+        for i, vector in enumerate(vectors):
+            found = self._lookup.get(self.__key(vector))
+            if found is None:
+                misses.append(i)
+            else:
+                matches[i] = found
+        if misses:
+            # Squared distances to every sprite at once, as |a|^2 + |b|^2 - 2ab
+            queries = vectors[misses].astype(np.float32)
+            distances = (queries**2).sum(axis=1)[:, None] + self._squares[None] - 2 * queries @ self._floats.T
+            nearest = distances.argmin(axis=1)
+            close = distances[np.arange(len(misses)), nearest] <= MAX_DISTANCE**2 * FEATURES
+            matches[misses] = np.where(close, nearest, -1)
+        return matches
+
+    def identify(self, slot_image: np.ndarray) -> Optional[str]:
+        """
+        Identifies the item in a screenshot of a slot.
+        Args:
+            slot_image: A BGR screenshot of a slot (E.g., of `Window.inventory_slots[i]`).
+        Returns:
+            The name of the item (the sprite's file name), or None if the slot is empty or the item isn't indexed.
+        """
+        i = self.match(slot_features(slot_image))
+        return self.names[i] if i >= 0 else None
+
+
+_lock = threading.Lock()
+_indexes: Dict[tuple, SpriteIndex] = {}
+
+
+def get_index(folders: Sequence[Union[str, pathlib.Path]] = SPRITE_FOLDERS, path: Union[str, pathlib.Path] = INDEX_PATH, refresh: bool = False) -> SpriteIndex:
+    """
+    Returns the index of the sprites in the given folders, loading it from `path` or (re)building and saving it if the
+    sprites have changed. The index is kept in memory after the first call.
+    Args:
+        folders: The folders of sprites to index.
+        path: Where the index is saved.
+        refresh: Whether to check the sprites for changes again (E.g., after downloading new ones).
+    """
+    key = (tuple(map(str, folders)), str(path))
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None and not refresh:
+            return index
+        current = fingerprint(folders)
+        if index is None or index.fingerprint != current:
+            index = SpriteIndex.load(path, current)
+            if index is None:
+                index = SpriteIndex.build(folders)
+                try:
+                    index.save(path)
+                except OSError as e:
+                    print(f"Sprite index could not be saved ({e}).")
+            _indexes[key] = index
+        return index
+
+
+def identify(slot_image: np.ndarray) -> Optional[str]:
+    """
+    Identifies the item in a screenshot of a slot using the sprites in SPRITE_FOLDERS. See `SpriteIndex.identify`.
+    """
+    return get_index().identify(slot_image)
+
+
+if __name__ == "__main__":
+    """
+    Run this file directly to rebuild the sprite index.
+    """
+    index = SpriteIndex.build()
+    index.save(INDEX_PATH)
+    print(f"Indexed {len(index.names)} sprites. Wrote {INDEX_PATH}")
@@ -0,0 +1,125 @@
+"""
+An OCR engine that correlates a region against every glyph of a font in one batched operation. Glyph templates of
+equal height are zero-padded to a common width and stacked into one matrix, and the image is unrolled into rows of
+template-sized windows (im2col), so a single matrix multiply computes the correlation of every glyph at every
+position. Only positions where nearly all of a glyph's ink is present are kept, and the normalization of
+`cv2.TM_CCOEFF_NORMED` is applied to those using window sums from an integral image, so the results are the same as
+those of the template engine in `utilities.ocr`.
+
+Text pixels are treated as binary (as produced by `clr.isolate_colors`), and windows are unrolled a band of rows at
+a time to bound memory use.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from utilities.glyph_ocr import THRESHOLD
+
+# The maximum size of a band of unrolled windows
+MAX_BLOCK_BYTES = 8 * 1024 * 1024
+# The fraction of a glyph's ink that must be present in a window for it to be scored. For binary images, no window
+# with less than ~96.3% of the ink reaches THRESHOLD.
+MIN_OVERLAP = 0.95
+
+
+class GlyphStack:
+    def __init__(self, font: Dict[str, np.ndarray], crop: int):
+        """
+        Stacks a font's glyph templates into a matrix of shape (glyphs, height * max width).
+        Args:
+            font: A font dictionary of {"char": image} pairs (see `utilities.ocr`).
+            crop: The number of rows trimmed from the top of each glyph, as in the template engine.
+        """
+        self.font = font
+        self.chars = list(font)
+        self.row: Dict[str, int] = {char: i for i, char in enumerate(self.chars)}
+        templates = [(font[char][crop:] > 0).astype(np.float32) for char in self.chars]
+        self.height = templates[0].shape[0]
+        self.widths = np.array([template.shape[1] for template in templates])
+        self.max_width = int(self.widths.max())
+        self.matrix = np.zeros((len(templates), self.height, self.max_width), dtype=np.float32)
+        for i, template in enumerate(templates):
+            self.matrix[i, :, : template.shape[1]] = template
+        self.matrix = self.matrix.reshape(len(templates), -1)
+        # Statistics used to normalize the correlation, as computed by cv2.matchTemplate
+        areas = self.height * self.widths
+        sums = np.array([template.sum() for template in templates], dtype=np.float64)
+        self.means = sums / areas
+        self.norms = np.sqrt(np.maximum(sums - sums * self.means, 0))
+        self.counts = sums
+
+
+_stacks: Dict[Tuple[int, int], GlyphStack] = {}
+
+
+def get_stack(font: Dict[str, np.ndarray], crop: int) -> GlyphStack:
+    """
+    Returns the GlyphStack for a font, building it on first use.
+    """
+    stack = _stacks.get((id(font), crop))
+    if stack is None or stack.font is not font:
+        stack = _stacks[(id(font), crop)] = GlyphStack(font, crop)
+    return stack
+
+
+def match_chars(image: np.ndarray, font: Dict[str, np.ndarray], chars: Sequence[str], crop: int) -> List[list]:
+    """
+    Locates each instance of the given characters in a color-isolated image.
+    Args:
+        image: A single-channel image where text pixels are non-zero (E.g., the output of `clr.isolate_colors`).
+        font: The font dictionary to read.
+        chars: The characters to search for.
+        crop: The number of rows trimmed from the top of each glyph by the template engine.
+    Returns:
+        A list of [char, x, y] entries in the same order as the template engine: by character, then row-major.
+    """
+    stack = get_stack(font, crop)
+    chars = [char for char in chars if char in stack.row]
+    ink = (image.reshape(image.shape[0], image.shape[1]) > 0).astype(np.float32)
+    img_h, img_w = ink.shape
+    h, max_w = stack.height, stack.max_width
+    if not chars or img_h < h:
+        return []
+    rows = np.array([stack.row[char] for char in chars])
+    matrix = stack.matrix[rows].T
+    widths = stack.widths[rows]
+    n_rows = img_h - h + 1
+    # For binary images, a correlation of at least 0.98 requires at least 96% of a glyph's ink to be present
+    min_overlap = np.where(stack.norms[rows] > 0, stack.counts[rows] * MIN_OVERLAP, -np.inf)
+
+    # Correlate every glyph at every position, a band of rows at a time, keeping only the candidates. The image is
+    # padded on the right so that narrow glyphs can be placed as far right as the template engine would place them.
+    padded = np.pad(ink, ((0, 0), (0, max_w)))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (h, max_w))[:, :img_w]
+    block = max(1, MAX_BLOCK_BYTES // (img_w * h * max_w * 4))
+    candidates = []
+    for top in range(0, n_rows, block):
+        products = windows[top : top + block].reshape(-1, h * max_w) @ matrix
+        positions, glyphs = np.nonzero(products >= min_overlap)
+        candidates.append((glyphs, positions + top * img_w, products[positions, glyphs]))
+    glyphs, positions, overlaps = (np.concatenate(parts) for parts in zip(*candidates))
+    ys, xs = np.divmod(positions, img_w)
+    w = widths[glyphs]
+    valid = xs + w <= img_w
+    glyphs, ys, xs, w, overlaps = glyphs[valid], ys[valid], xs[valid], w[valid], overlaps[valid].astype(np.float64)
+
+    # Normalize as cv2.TM_CCOEFF_NORMED does, using window sums from the integral image (ink is 0 or 1, so the sum
+    # of squares is the sum)
+    integral = cv2.integral(ink, sdepth=cv2.CV_64F)
+    sums = integral[ys + h, xs + w] - integral[ys, xs + w] - integral[ys + h, xs] + integral[ys, xs]
+    window_norms = np.sqrt(np.maximum(sums - sums * sums / (h * w), 0))
+    numerator = overlaps - stack.means[rows][glyphs] * sums
+    denominator = window_norms * stack.norms[rows][glyphs]
+    # Mimic cv2's handling of windows with little or no variance, and of templates with none (a match everywhere)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(
+            np.abs(numerator) < denominator,
+            numerator / denominator,
+            np.where(np.abs(numerator) < denominator * 1.125, np.sign(numerator), 0),
+        )
+    scores[stack.norms[rows][glyphs] == 0] = 1
+    matched = scores >= THRESHOLD
+    glyphs, ys, xs = glyphs[matched], ys[matched], xs[matched]
+    order = np.lexsort((xs, ys, glyphs))
+    return [[chars[glyph], x, y] for glyph, x, y in zip(glyphs[order].tolist(), xs[order].tolist(), ys[order].tolist())]
@@ -0,0 +1,188 @@
+"""
+Follows outlined objects (see `utilities.runelite_cv.extract_objects`) from one detection to the next, giving each a
+stable ID and an estimate of its velocity. This allows a bot to tell whether the NPC it is looking at is the same one
+it saw last time, and to aim where a moving NPC will be once the mouse gets there rather than where it was.
+
+Detections are associated with existing tracks greedily by the distance between their centers and the tracks'
+predicted centers. A track that goes undetected for more than `MAX_MISSES` updates is dropped.
+
+Example:
+    >>> tracker = ObjectTracker()
+    >>> npc = self.get_nearest_tagged_NPC()  # Or: tracker.update(self.get_all_tagged_in_rect(...))
+    >>> tracker.update([npc])
+    >>> self.mouse.move_to(tracker.random_point(npc, lead=self.mouse.estimate_duration(npc.center())))
+"""
+import itertools
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utilities.geometry import Point, RuneLiteObject
+
+# The farthest a detection's center may be from a track's predicted center to be considered the same object, in pixels
+MAX_DISTANCE = 60
+# The number of consecutive updates a track may go undetected before it is dropped
+MAX_MISSES = 3
+# The weight of the newest measurement in the velocity estimate (1 uses only the latest movement)
+VELOCITY_SMOOTHING = 0.5
+# The speed below which an object is considered stationary, in pixels per second
+MIN_SPEED = 5.0
+# The longest time a velocity is extrapolated for, in seconds. NPCs rarely keep a heading for longer.
+MAX_LEAD = 2.0
+
+
+class Track:
+    __slots__ = ("id", "obj", "velocity", "last_seen", "hits", "misses")
+
+    def __init__(self, id: int, obj: RuneLiteObject, timestamp: float):
+        """
+        An object followed across detections.
+        Args:
+            id: The track's unique ID.
+            obj: The object's latest detection.
+            timestamp: The time of the latest detection, in seconds.
+        """
+        self.id = id
+        self.obj = obj
+        self.velocity = np.zeros(2)
+        self.last_seen = timestamp
+        self.hits = 1
+        self.misses = 0
+
+    @property
+    def moving(self) -> bool:
+        """
+        Whether the object is moving faster than MIN_SPEED.
+        """
+        return self.hits > 1 and float(np.hypot(*self.velocity)) >= MIN_SPEED
+
+    def offset(self, seconds: float) -> Point:
+        """
+        Gets the distance the object is predicted to move in the given time after its latest detection.
+        Args:
+            seconds: The time after the latest detection, capped at MAX_LEAD.
+        Returns:
+            A Point of the (x, y) offset in pixels.
+        """
+        if not self.moving:
+            return Point(0, 0)
+        dx, dy = self.velocity * min(max(seconds, 0.0), MAX_LEAD)
+        return Point(round(dx), round(dy))
+
+    def predict(self, seconds: float = 0.0) -> Point:
+        """
+        Gets the object's predicted center relative to its containing Rectangle (as `_center` is).
+        Args:
+            seconds: The time after the latest detection.
+        """
+        dx, dy = self.offset(seconds)
+        return Point(self.obj._center[0] + dx, self.obj._center[1] + dy)
+
+    def __str__(self):
+        return f"Track(id={self.id}, center={self.predict()}, velocity=({self.velocity[0]:.0f}, {self.velocity[1]:.0f}))"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class ObjectTracker:
+    def __init__(self, max_distance: float = MAX_DISTANCE, max_misses: int = MAX_MISSES):
+        """
+        Tracks objects detected within one Rectangle (E.g., the game view).
+        Args:
+            max_distance: The farthest an object may move between updates to keep its ID, in pixels.
+            max_misses: The number of consecutive updates an object may go undetected before its track is dropped.
+        """
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+        self._by_object: Dict[int, Track] = {}
+
+    def update(self, objs: List[RuneLiteObject], timestamp: float = None) -> List[Track]:
+        """
+        Associates a new set of detections with the existing tracks, creating tracks for new objects and dropping
+        those that have gone undetected for too long.
+        Args:
+            objs: The objects detected in the latest frame.
+            timestamp: The time of the frame, in seconds. Defaults to now.
+        Returns:
+            The track of each detection, in the same order as `objs`.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        objs = [obj for obj in objs if obj is not None]
+        assigned: List[Optional[Track]] = [None] * len(objs)
+        if self.tracks and objs:
+            predicted = np.array([track.predict(timestamp - track.last_seen) for track in self.tracks], dtype=np.float64)
+            centers = np.array([obj._center for obj in objs], dtype=np.float64)
+            distances = np.linalg.norm(predicted[:, None, :] - centers[None, :, :], axis=2)
+            # Greedily pair the closest track and detection until no pair is within max_distance
+            used_tracks, used_objs = set(), set()
+            for flat in np.argsort(distances, axis=None):
+                t, o = divmod(int(flat), len(objs))
+                if distances[t, o] > self.max_distance:
+                    break
+                if t in used_tracks or o in used_objs:
+                    continue
+                used_tracks.add(t)
+                used_objs.add(o)
+                assigned[o] = self.__advance(self.tracks[t], objs[o], timestamp)
+
+        matched = {id(track) for track in assigned if track is not None}
+        for track in self.tracks:
+            if id(track) not in matched:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        for i, obj in enumerate(objs):
+            if assigned[i] is None:
+                assigned[i] = Track(next(self._ids), obj, timestamp)
+                self.tracks.append(assigned[i])
+        self._by_object = {id(track.obj): track for track in assigned}
+        return assigned
+
+    def __advance(self, track: Track, obj: RuneLiteObject, timestamp: float) -> Track:
+        """
+        Moves a track to a new detection, updating its velocity estimate.
+        """
+        elapsed = timestamp - track.last_seen
+        if elapsed > 0:
+            measured = (np.array(obj._center, dtype=np.float64) - track.obj._center) / elapsed
+            track.velocity = measured if track.hits == 1 else VELOCITY_SMOOTHING * measured + (1 - VELOCITY_SMOOTHING) * track.velocity
+        track.obj = obj
+        track.last_seen = timestamp
+        track.hits += 1
+        track.misses = 0
+        return track
+
+    def track_of(self, obj: RuneLiteObject) -> Optional[Track]:
+        """
+        Gets the track of an object passed to the latest `update`, or None if it wasn't.
+        """
+        return self._by_object.get(id(obj)) if obj is not None else None
+
+    def random_point(self, obj: RuneLiteObject, lead: float = 0.0) -> Point:
+        """
+        Gets a random point within an object, shifted to where the object is predicted to be.
+        Args:
+            obj: An object passed to the latest `update`.
+            lead: The time until the point is reached, in seconds (E.g., `Mouse.estimate_duration()` for the move
+                  to the object). The time since the object was detected is added to it.
+        Returns:
+            A Point relative to the client window. If the object isn't tracked or isn't moving, this is the same as
+            `obj.random_point()`.
+        """
+        point = obj.random_point()
+        track = self.track_of(obj)
+        if track is None:
+            return point
+        dx, dy = track.offset(time.time() - track.last_seen + lead)
+        return Point(point.x + dx, point.y + dy)
+
+    def clear(self) -> None:
+        """
+        Drops all tracks (E.g., after the camera has moved).
+        """
+        self.tracks = []
+        self._by_object = {}
@@ -7,6 +7,7 @@ matter where the game client is positioned. This class can be extended to add mo
 At the moment, it only works for 2007-style interfaces. In the future, to accomodate other interface
 styles, this class should be abstracted, then extended for each interface style.
 """
+import math
 import time
 from typing import List
 
@@ -15,6 +16,7 @@ from deprecated import deprecated
 
 import utilities.debug as debug
 import utilities.imagesearch as imsearch
+from utilities.capture import CaptureService, frame_cache
 from utilities.geometry import Point, Rectangle
 
 
@@ -111,6 +113,28 @@ class Window:
         if client := self.window:
             return Rectangle(client.left, client.top, client.width, client.height)
 
+    def frame(self):
+        """
+        Context manager that captures the entire client window once. While inside the context, screenshots of
+        any Rectangle within the client are served from this single capture instead of grabbing the screen again.
+        Example:
+            >>> with self.win.frame():
+            >>>     hp = self.get_hp()
+            >>>     npc = self.get_nearest_tagged_NPC()
+        """
+        return frame_cache.frame(self.rectangle().to_dict())
+
+    def capture_service(self, fps: float = 20, buffer_size: int = 8) -> CaptureService:
+        """
+        Creates a CaptureService that continuously grabs the client window on a background thread.
+        Args:
+            fps: The target number of captures per second.
+            buffer_size: The number of recent frames to keep.
+        Returns:
+            A CaptureService that has not yet been started.
+        """
+        return CaptureService(self.rectangle().to_dict(), fps=fps, buffer_size=buffer_size)
+
     def resize(self, width: int, height: int) -> None:
         """
         Resizes the client window..
@@ -121,6 +145,40 @@ class Window:
         if client := self.window:
             client.size = (width, height)
 
+    def layout(self) -> dict:
+        """
+        Returns the positions of all located UI regions as plain data, suitable for saving alongside recordings.
+        Returns:
+            A dict of {name: rect} or {name: [rect, ...]} entries, where each rect is a `Rectangle.to_layout()` dict
+            (its position and any masked areas), along with flags describing the client (E.g., `client_fixed`).
+        """
+        layout = {}
+        for cls in reversed(type(self).__mro__):
+            for name in getattr(cls, "__annotations__", {}):
+                value = getattr(self, name, None)
+                if isinstance(value, Rectangle):
+                    layout[name] = value.to_layout()
+                elif isinstance(value, list) and value and all(isinstance(rect, Rectangle) for rect in value):
+                    layout[name] = [rect.to_layout() for rect in value]
+                elif isinstance(value, bool):
+                    layout[name] = value
+        return layout
+
+    def load_layout(self, layout: dict) -> None:
+        """
+        Restores UI region positions previously returned by `layout()`. This is an alternative to `initialize()`
+        when working with recorded frames.
+        Args:
+            layout: The layout dict to restore.
+        """
+        for name, value in layout.items():
+            if isinstance(value, bool):
+                setattr(self, name, value)
+            elif isinstance(value, list):
+                setattr(self, name, [Rectangle.from_layout(rect) for rect in value])
+            else:
+                setattr(self, name, Rectangle.from_layout(value))
+
     def initialize(self):
         """
         Initializes the client window by locating critical UI regions.
@@ -130,9 +188,11 @@ class Window:
         """
         start_time = time.time()
         client_rect = self.rectangle()
-        a = self.__locate_minimap(client_rect)
-        b = self.__locate_chat(client_rect)
-        c = self.__locate_control_panel(client_rect)
+        # Capture the client once and locate all UI elements within that single frame
+        with frame_cache.frame(client_rect.to_dict()):
+            a = self.__locate_minimap(client_rect)
+            b = self.__locate_chat(client_rect)
+            c = self.__locate_control_panel(client_rect)
         d = self.__locate_game_view(client_rect)
         if all([a, b, c, d]):  # if all templates found
             print(f"Window.initialize() took {time.time() - start_time} seconds.")
@@ -147,7 +207,7 @@ class Window:
         Returns:
             True if successful, False otherwise.
         """
-        if chat := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("ui_templates", "chat.png"), client_rect):
+        if chat := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("ui_templates", "chat.png"), client_rect, pyramid=True):
             # Locate chat tabs
             self.chat_tabs = []
             x, y = 5, 143
@@ -167,7 +227,7 @@ class Window:
         Returns:
             True if successful, False otherwise.
         """
-        if cp := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("ui_templates", "inv.png"), client_rect):
+        if cp := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("ui_templates", "inv.png"), client_rect, pyramid=True):
             self.__locate_cp_tabs(cp)
             self.__locate_inv_slots(cp)
             self.__locate_prayers(cp)
@@ -289,7 +349,9 @@ class Window:
             True if successful, False otherwise.
         """
         # 'm' refers to minimap area
-        if m := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("ui_templates", "minimap.png"), client_rect):
+        resizable, fixed = imsearch.BOT_IMAGES.joinpath("ui_templates", "minimap.png"), imsearch.BOT_IMAGES.joinpath("ui_templates", "minimap_fixed.png")
+        found = imsearch.search_many([resizable, fixed], client_rect, first=True, pyramid=True)
+        if m := found[resizable]:
             self.client_fixed = False
             self.compass_orb = Rectangle(left=40 + m.left, top=7 + m.top, width=24, height=26)
             self.hp_orb_text = Rectangle(left=4 + m.left, top=60 + m.top, width=20, height=13)
@@ -301,7 +363,7 @@ class Window:
             self.spec_orb = Rectangle(left=62 + m.left, top=144 + m.top, width=18, height=20)
             self.spec_orb_text = Rectangle(left=36 + m.left, top=151 + m.top, width=20, height=13)
             self.total_xp = Rectangle(left=m.left - 147, top=m.top + 4, width=104, height=21)
-        elif m := imsearch.search_img_in_rect(imsearch.BOT_IMAGES.joinpath("ui_templates", "minimap_fixed.png"), client_rect):
+        elif m := found.get(fixed):
             self.client_fixed = True
             self.compass_orb = Rectangle(left=31 + m.left, top=7 + m.top, width=24, height=25)
             self.hp_orb_text = Rectangle(left=4 + m.left, top=55 + m.top, width=20, height=13)
@@ -314,13 +376,22 @@ class Window:
             self.spec_orb_text = Rectangle(left=36 + m.left, top=146 + m.top, width=20, height=13)
             self.total_xp = Rectangle(left=m.left - 104, top=m.top + 6, width=104, height=21)
         if m:
-            # Take a bite out of the bottom-left corner of the minimap to exclude orb's green numbers
+            # Only keep the round minimap itself, and take a bite out of the bottom-left corner to exclude orb's green numbers
+            self.minimap.keep_polygon(self.__ellipse_points(self.minimap.width, self.minimap.height))
             self.minimap.subtract_list = [{"left": 0, "top": self.minimap.height - 20, "width": 20, "height": 20}]
             self.minimap_area = m
             return True
         print("Window.__locate_minimap(): Failed to find minimap.")
         return False
 
+    def __ellipse_points(self, width: int, height: int, count: int = 72) -> List[Point]:
+        """
+        Returns the vertices of a polygon approximating the ellipse that fits inside a width x height area.
+        """
+        a, b = width / 2, height / 2
+        angles = [2 * math.pi * i / count for i in range(count)]
+        return [Point(round(a + a * math.cos(t)), round(b + b * math.sin(t))) for t in angles]
+
 
 class MockWindow(Window):
     def __init__(self):